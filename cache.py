@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Простой in-memory кэш с ограничением размера и времени жизни записей
+и объединение одновременных одинаковых запросов
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """LRU-кэш, записи которого устаревают через ttl секунд"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # Счетчик записей, вытесненных из-за ограничения размера
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """
+        Получение значения из кэша
+
+        Args:
+            key (Hashable): Ключ
+            default (Any): Значение при промахе или устаревшей записи
+
+        Returns:
+            Any: Закэшированное значение или default
+        """
+        item = self._data.get(key)
+        if item is None:
+            return default
+
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохранение значения с вытеснением самых старых записей
+
+        Args:
+            key (Hashable): Ключ
+            value (Any): Значение
+        """
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Удаление записи (если она есть)
+
+        Args:
+            key (Hashable): Ключ
+        """
+        self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Одновременные вызовы с одним ключом ждут результат первого вызова"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнение func или ожидание уже идущего вызова с тем же ключом
+
+        Args:
+            key (Hashable): Ключ запроса
+            func (Callable[[], Awaitable[Any]]): Фабрика корутины запроса
+
+        Returns:
+            Any: Результат func (общий для всех одновременных вызовов)
+        """
+        # shield: отмена одного ожидающего не должна отменять общий результат
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await func()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Помечаем исключение полученным, если ожидающих не было
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -5,22 +5,131 @@
 """
 
 import os
-from typing import Optional
-from dotenv import load_dotenv
+import functools
+import importlib.util
+import logging
+from typing import Dict, Optional
+from dotenv import dotenv_values, find_dotenv
 
-# Загружаем переменные из .env файла
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Обязательные переменные: если все заданы в окружении, .env не читаем
+_REQUIRED_ENV_VARS = ('BOT_TOKEN', 'WEATHER_API_KEY')
+
+# Флаг однократной загрузки .env файла
+_DOTENV_LOADED = False
+
+# Кэш разобранного .env в виде Python-модуля (его байткод кэшируется в .pyc)
+_ENV_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '_env_cache.py')
+
+
+def _load_env_cache(dotenv_path: str, mtime_ns: int) -> Optional[Dict[str, str]]:
+    """
+    Чтение кэша .env, если он соответствует текущей версии файла
+    
+    Кэш загружается строго из _ENV_CACHE_PATH, а не поиском по sys.path:
+    посторонний модуль _env_cache не должен стать источником токенов.
+    
+    Args:
+        dotenv_path (str): Путь к .env
+        mtime_ns (int): Время изменения .env в наносекундах
+        
+    Returns:
+        Optional[Dict[str, str]]: Переменные из кэша или None
+    """
+    if not os.path.exists(_ENV_CACHE_PATH):
+        return None
+    
+    spec = importlib.util.spec_from_file_location('_env_cache', _ENV_CACHE_PATH)
+    env_cache = importlib.util.module_from_spec(spec)
+    try:
+        # SourceFileLoader кэширует байткод в __pycache__
+        spec.loader.exec_module(env_cache)
+    except Exception:
+        # Поврежденный кэш просто перезаписывается
+        return None
+    
+    if getattr(env_cache, 'ENV_PATH', None) != dotenv_path:
+        return None
+    if getattr(env_cache, 'ENV_MTIME', None) != mtime_ns:
+        return None
+    return env_cache.ENV
+
+
+def _write_env_cache(values: Dict[str, str], dotenv_path: str, mtime_ns: int) -> None:
+    """
+    Запись кэша .env рядом с config.py
+    
+    Args:
+        values (Dict[str, str]): Разобранные переменные
+        dotenv_path (str): Путь к .env
+        mtime_ns (int): Время изменения .env в наносекундах
+    """
+    content = (
+        "# Автоматически сгенерировано config.py - не редактировать\n"
+        f"ENV_PATH = {dotenv_path!r}\n"
+        f"ENV_MTIME = {mtime_ns!r}\n"
+        f"ENV = {values!r}\n"
+    )
+    tmp_path = f"{_ENV_CACHE_PATH}.tmp"
+    try:
+        # Файл содержит токены: доступ только владельцу (байткод .pyc
+        # наследует права исходного файла)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, _ENV_CACHE_PATH)
+    except OSError:
+        # Кэш необязателен: при read-only файловой системе просто парсим .env
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+def _ensure_dotenv() -> None:
+    """
+    Загрузка переменных из .env файла не более одного раза на процесс
+    
+    Если все обязательные переменные уже заданы в окружении (например,
+    в контейнере), файл .env не читается вовсе. Разобранные значения кэшируются
+    в _env_cache.py и используются, пока не изменится время модификации .env.
+    """
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    _DOTENV_LOADED = True
+    
+    if all(os.environ.get(name) for name in _REQUIRED_ENV_VARS):
+        return
+    
+    dotenv_path = find_dotenv()
+    if not dotenv_path:
+        return
+    
+    mtime_ns = os.stat(dotenv_path).st_mtime_ns
+    values = _load_env_cache(dotenv_path, mtime_ns)
+    if values is None:
+        values = {
+            key: value
+            for key, value in dotenv_values(dotenv_path).items()
+            if value is not None
+        }
+        _write_env_cache(values, dotenv_path, mtime_ns)
+    
+    # Как load_dotenv(override=False): не перезаписываем существующие переменные
+    for key, value in values.items():
+        os.environ.setdefault(key, value)
 
 
 class Config:
     """Класс для управления конфигурацией бота"""
     
+    # Снимок переменных окружения, снимается один раз на процесс
+    _env_snapshot: Optional[Dict[str, str]] = None
+    
     def __init__(self):
-        # Telegram Bot Token
-        self.bot_token: str = self._get_env_var('BOT_TOKEN')
-        
-        # OpenWeatherMap API Key
-        self.weather_api_key: str = self._get_env_var('WEATHER_API_KEY')
+        # Токены (bot_token, weather_api_key) читаются лениво при первом обращении
         
         # API URLs
         self.weather_base_url: str = 'https://api.openweathermap.org/data/2.5'
@@ -31,13 +140,52 @@ class Config:
         self.request_timeout: int = 10
         self.max_retries: int = 3
         
+        # Пул соединений к API погоды (keep-alive, кэш DNS)
+        self.connection_limit: int = 100
+        self.connection_limit_per_host: int = 20
+        self.dns_cache_ttl: int = 300  # 5 минут
+        self.keepalive_timeout: int = 75  # секунд простоя до закрытия соединения
+        
+        # Long polling: сколько секунд Telegram держит запрос getUpdates
+        self.polling_timeout: int = 50
+        
+        # Максимум одновременно обрабатываемых апдейтов
+        self.max_concurrent_updates: int = 64
+        
         # Языковые настройки
         self.default_language: str = 'ru'
         self.default_units: str = 'metric'
         
-        # Настройки кэширования (если нужно добавить в будущем)
-        self.cache_ttl: int = 300  # 5 минут
+        # Webhook: если WEBHOOK_URL не задан, бот работает через long polling
+        self.webhook_url: Optional[str] = self._get_optional_env_var('WEBHOOK_URL')
+        self.webhook_path: str = '/webhook'
+        self.webhook_secret: Optional[str] = self._get_optional_env_var('WEBHOOK_SECRET')
+        self.webapp_host: str = self._get_optional_env_var('WEBAPP_HOST') or '0.0.0.0'
+        self.webapp_port: int = int(self._get_optional_env_var('WEBAPP_PORT') or 8080)
         
+        # База данных избранных городов
+        self.database_path: str = self._get_optional_env_var('DATABASE_PATH') or 'bot.sqlite3'
+        self.favorites_cache_size: int = 10_000  # пользователей в памяти
+        
+        # Состояния FSM неактивных пользователей удаляются из памяти
+        self.fsm_state_ttl: int = 3600  # 1 час
+        self.fsm_sweep_interval: int = 600  # 10 минут
+        
+        # Настройки кэширования ответов API
+        self.cache_maxsize: int = 512
+        self.weather_cache_ttl: int = 600  # 10 минут
+        self.forecast_cache_ttl: int = 3600  # 1 час
+        
+    @functools.cached_property
+    def bot_token(self) -> str:
+        """Telegram Bot Token"""
+        return self._get_env_var('BOT_TOKEN')
+    
+    @functools.cached_property
+    def weather_api_key(self) -> str:
+        """OpenWeatherMap API Key"""
+        return self._get_env_var('WEATHER_API_KEY')
+    
     def _get_env_var(self, var_name: str) -> str:
         """
         Получение переменной окружения с проверкой
@@ -51,7 +199,7 @@ class Config:
         Raises:
             ValueError: Если переменная не найдена
         """
-        value = os.getenv(var_name)
+        value = self._get_optional_env_var(var_name)
         if not value:
             raise ValueError(
                 f"Переменная окружения {var_name} не найдена!\n"
@@ -59,6 +207,27 @@ class Config:
             )
         return value
     
+    def _get_optional_env_var(self, var_name: str) -> Optional[str]:
+        """
+        Получение необязательной переменной окружения
+        
+        Args:
+            var_name (str): Название переменной
+            
+        Returns:
+            Optional[str]: Значение переменной или None
+        """
+        if Config._env_snapshot is None:
+            Config.load_env_snapshot()
+        
+        return self._env_snapshot.get(var_name)
+    
+    @classmethod
+    def load_env_snapshot(cls) -> None:
+        """Однократное копирование os.environ в словарь класса"""
+        _ensure_dotenv()
+        cls._env_snapshot = dict(os.environ)
+    
     def validate_config(self) -> bool:
         """
         Проверка корректности конфигурации
@@ -66,18 +235,21 @@ class Config:
         Returns:
             bool: True если конфигурация валидна
         """
+        return self._is_valid
+    
+    @functools.cached_property
+    def _is_valid(self) -> bool:
+        """Результат проверки конфигурации (токены неизменны, проверяем один раз)"""
         try:
-            # Проверяем наличие основных параметров
-            if not self.bot_token or len(self.bot_token) < 10:
-                return False
-                
-            if not self.weather_api_key or len(self.weather_api_key) < 10:
-                return False
-                
-            return True
-            
-        except Exception:
+            bot_token = self.bot_token
+            weather_api_key = self.weather_api_key
+        except ValueError as e:
+            # Ленивое чтение токена: переменная окружения не задана
+            logger.error("%s", e)
             return False
+        
+        # Проверяем наличие основных параметров
+        return len(bot_token) >= 10 and len(weather_api_key) >= 10
     
     def get_weather_params(self, city: str, forecast: bool = False) -> dict:
         """
@@ -90,23 +262,29 @@ class Config:
         Returns:
             dict: Словарь параметров
         """
-        params = {
-            'q': city,
+        base = self._forecast_template if forecast else self._params_template
+        return {**base, 'q': city}
+    
+    @functools.cached_property
+    def _params_template(self) -> dict:
+        """Неизменная часть параметров API запроса"""
+        return {
             'appid': self.weather_api_key,
             'lang': self.default_language,
             'units': self.default_units
         }
-        
-        if forecast:
-            params['cnt'] = 40  # 5 дней по 3-часовым интервалам
-            
-        return params
+    
+    @functools.cached_property
+    def _forecast_template(self) -> dict:
+        """Неизменная часть параметров запроса прогноза"""
+        return {
+            **self._params_template,
+            'cnt': 40  # 5 дней по 3-часовым интервалам
+        }
 
 
 # Глобальная конфигурация (синглтон)
-_config_instance: Optional[Config] = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_config() -> Config:
     """
     Получение экземпляра конфигурации (синглтон)
@@ -114,7 +292,6 @@ def get_config() -> Config:
     Returns:
         Config: Экземпляр конфигурации
     """
-    global _config_instance
-    if _config_instance is None:
-        _config_instance = Config()
-    return _config_instance 
+    if Config._env_snapshot is None:
+        Config.load_env_snapshot()
+    return Config()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранилище состояний FSM в памяти с удалением неактивных записей
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiringMemoryStorage(MemoryStorage):
+    """
+    MemoryStorage, из которого периодически удаляются давно не используемые записи
+
+    Обычный MemoryStorage создает запись для каждого пользователя и никогда
+    ее не удаляет, поэтому память долго работающего бота растет без ограничений.
+    """
+
+    def __init__(self, ttl: float = 3600, sweep_interval: float = 600):
+        super().__init__()
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        # Время последнего обращения к записи каждого пользователя
+        self._touched: Dict[StorageKey, float] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запуск фоновой очистки устаревших записей"""
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        """Остановка фоновой очистки"""
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await super().close()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self._touched[key] = time.monotonic()
+        await super().set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        self._touched[key] = time.monotonic()
+        return await super().get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        self._touched[key] = time.monotonic()
+        await super().set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        self._touched[key] = time.monotonic()
+        return await super().get_data(key)
+
+    def sweep(self) -> int:
+        """
+        Удаление записей, к которым не обращались дольше ttl секунд
+
+        Returns:
+            int: Число удаленных записей
+        """
+        deadline = time.monotonic() - self.ttl
+        expired = [key for key, touched in self._touched.items() if touched <= deadline]
+        for key in expired:
+            del self._touched[key]
+            self.storage.pop(key, None)
+        return len(expired)
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            removed = self.sweep()
+            if removed:
+                logger.info("Удалено устаревших состояний FSM: %s", removed)
@@ -4,6 +4,9 @@
 Модуль клавиатур для Telegram бота
 """
 
+import functools
+import sys
+
 from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
@@ -13,7 +16,67 @@ from aiogram.types import (
 from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 
 
-def get_main_keyboard() -> ReplyKeyboardMarkup:
+# Тексты кнопок reply-клавиатур. Интернируем, чтобы клавиатуры и фильтры
+# хэндлеров ссылались на одни и те же объекты строк
+BTN_CURRENT = sys.intern("🌡️ Текущая погода")
+BTN_FORECAST5 = sys.intern("📅 Прогноз на 5 дней")
+BTN_FAVORITES = sys.intern("📍 Избранные города")
+BTN_SETTINGS = sys.intern("⚙️ Настройки")
+BTN_HELP = sys.intern("ℹ️ Помощь")
+BTN_ABOUT = sys.intern("📊 О боте")
+BTN_REFRESH = sys.intern("🔄 Обновить")
+BTN_TO_FAVORITES = sys.intern("⭐ В избранное")
+BTN_FORECAST = sys.intern("📅 Прогноз")
+BTN_BACK = sys.intern("🔙 Назад")
+BTN_NOW = sys.intern("🌡️ Сейчас")
+BTN_DETAILED = sys.intern("📊 Подробно")
+BTN_TO_MENU = sys.intern("🔙 В меню")
+BTN_UNITS = sys.intern("🌡️ Единицы измерения")
+BTN_LANGUAGE = sys.intern("🌍 Язык")
+BTN_NOTIFICATIONS = sys.intern("🔔 Уведомления")
+BTN_LOCATION = sys.intern("📍 Местоположение")
+BTN_MAIN_MENU = sys.intern("🔙 В главное меню")
+BTN_ADD_CITY = sys.intern("➕ Добавить город")
+BTN_EDIT = sys.intern("✏️ Редактировать")
+BTN_CLEAR = sys.intern("🗑️ Очистить все")
+
+# Префикс кнопок избранных городов
+FAVORITE_CITY_PREFIX = sys.intern("📍 ")
+
+# Telegram ограничивает callback_data 64 байтами
+CALLBACK_DATA_LIMIT = 64
+
+# Префиксы callback_data (в байтах, чтобы город кодировался один раз)
+_CB_PREFIXES = {
+    "refresh_weather": b"refresh_weather:",
+    "refresh_forecast": b"refresh_forecast:",
+    "current_weather": b"current_weather:",
+    "forecast": b"get_forecast:",
+    "favorite": b"add_favorite:",
+}
+
+
+def _add_city_button(
+    builder: InlineKeyboardBuilder, text: str, action: str, city: bytes
+) -> None:
+    """
+    Добавление кнопки с городом в callback_data
+
+    Если callback_data не укладывается в лимит Telegram, кнопка не добавляется:
+    обрезанное название указывало бы на другой город.
+
+    Args:
+        builder (InlineKeyboardBuilder): Строитель клавиатуры
+        text (str): Текст кнопки
+        action (str): Ключ префикса из _CB_PREFIXES
+        city (bytes): Название города в UTF-8
+    """
+    data = _CB_PREFIXES[action] + city
+    if len(data) <= CALLBACK_DATA_LIMIT:
+        builder.add(InlineKeyboardButton(text=text, callback_data=data.decode("utf-8")))
+
+
+def _build_main_keyboard() -> ReplyKeyboardMarkup:
     """
     Создание основной клавиатуры
 
@@ -24,17 +87,17 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
 
     # Основные кнопки
     builder.add(
-        KeyboardButton(text="🌡️ Текущая погода"),
-        KeyboardButton(text="📅 Прогноз на 5 дней"),
+        KeyboardButton(text=BTN_CURRENT),
+        KeyboardButton(text=BTN_FORECAST5),
     )
 
     # Дополнительные кнопки
     builder.add(
-        KeyboardButton(text="📍 Избранные города"), KeyboardButton(text="⚙️ Настройки")
+        KeyboardButton(text=BTN_FAVORITES), KeyboardButton(text=BTN_SETTINGS)
     )
 
     # Служебные кнопки
-    builder.add(KeyboardButton(text="ℹ️ Помощь"), KeyboardButton(text="📊 О боте"))
+    builder.add(KeyboardButton(text=BTN_HELP), KeyboardButton(text=BTN_ABOUT))
 
     # Настройка размещения кнопок (2 в ряд)
     builder.adjust(2, 2, 2)
@@ -44,7 +107,7 @@ def get_main_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
-def get_weather_keyboard() -> ReplyKeyboardMarkup:
+def _build_weather_keyboard() -> ReplyKeyboardMarkup:
     """
     Клавиатура для раздела текущей погоды
 
@@ -54,10 +117,10 @@ def get_weather_keyboard() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
 
     builder.add(
-        KeyboardButton(text="🔄 Обновить"), KeyboardButton(text="⭐ В избранное")
+        KeyboardButton(text=BTN_REFRESH), KeyboardButton(text=BTN_TO_FAVORITES)
     )
 
-    builder.add(KeyboardButton(text="📅 Прогноз"), KeyboardButton(text="🔙 Назад"))
+    builder.add(KeyboardButton(text=BTN_FORECAST), KeyboardButton(text=BTN_BACK))
 
     builder.adjust(2, 2)
 
@@ -66,7 +129,7 @@ def get_weather_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
-def get_forecast_keyboard() -> ReplyKeyboardMarkup:
+def _build_forecast_keyboard() -> ReplyKeyboardMarkup:
     """
     Клавиатура для раздела прогноза
 
@@ -75,9 +138,9 @@ def get_forecast_keyboard() -> ReplyKeyboardMarkup:
     """
     builder = ReplyKeyboardBuilder()
 
-    builder.add(KeyboardButton(text="🌡️ Сейчас"), KeyboardButton(text="📊 Подробно"))
+    builder.add(KeyboardButton(text=BTN_NOW), KeyboardButton(text=BTN_DETAILED))
 
-    builder.add(KeyboardButton(text="⭐ В избранное"), KeyboardButton(text="🔙 В меню"))
+    builder.add(KeyboardButton(text=BTN_TO_FAVORITES), KeyboardButton(text=BTN_TO_MENU))
 
     builder.adjust(2, 2)
 
@@ -86,7 +149,7 @@ def get_forecast_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
-def get_settings_keyboard() -> ReplyKeyboardMarkup:
+def _build_settings_keyboard() -> ReplyKeyboardMarkup:
     """
     Клавиатура настроек
 
@@ -96,14 +159,14 @@ def get_settings_keyboard() -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
 
     builder.add(
-        KeyboardButton(text="🌡️ Единицы измерения"), KeyboardButton(text="🌍 Язык")
+        KeyboardButton(text=BTN_UNITS), KeyboardButton(text=BTN_LANGUAGE)
     )
 
     builder.add(
-        KeyboardButton(text="🔔 Уведомления"), KeyboardButton(text="📍 Местоположение")
+        KeyboardButton(text=BTN_NOTIFICATIONS), KeyboardButton(text=BTN_LOCATION)
     )
 
-    builder.add(KeyboardButton(text="🔙 В главное меню"))
+    builder.add(KeyboardButton(text=BTN_MAIN_MENU))
 
     builder.adjust(2, 2, 1)
 
@@ -122,19 +185,26 @@ def get_favorites_keyboard(cities: list = None) -> ReplyKeyboardMarkup:
     Returns:
         ReplyKeyboardMarkup: Клавиатура избранных
     """
+    # Список нехэшируемый - приводим к кортежу для ключа кэша
+    return _build_favorites_keyboard(tuple(cities) if cities else ())
+
+
+@functools.lru_cache(maxsize=128)
+def _build_favorites_keyboard(cities: tuple) -> ReplyKeyboardMarkup:
+    """Сборка клавиатуры избранных городов (кэшируется по набору городов)"""
     builder = ReplyKeyboardBuilder()
 
     if cities:
         for city in cities[:6]:  # Максимум 6 городов
-            builder.add(KeyboardButton(text=f"📍 {city}"))
+            builder.add(KeyboardButton(text=FAVORITE_CITY_PREFIX + city))
     else:
-        builder.add(KeyboardButton(text="➕ Добавить город"))
+        builder.add(KeyboardButton(text=BTN_ADD_CITY))
 
     builder.add(
-        KeyboardButton(text="✏️ Редактировать"), KeyboardButton(text="🗑️ Очистить все")
+        KeyboardButton(text=BTN_EDIT), KeyboardButton(text=BTN_CLEAR)
     )
 
-    builder.add(KeyboardButton(text="🔙 В главное меню"))
+    builder.add(KeyboardButton(text=BTN_MAIN_MENU))
 
     # Настройка размещения
     if cities and len(cities) > 0:
@@ -147,6 +217,7 @@ def get_favorites_keyboard(cities: list = None) -> ReplyKeyboardMarkup:
     )
 
 
+@functools.lru_cache(maxsize=512)
 def get_inline_weather_keyboard(city: str) -> InlineKeyboardMarkup:
     """
     Inline клавиатура для сообения с погодой
@@ -158,22 +229,12 @@ def get_inline_weather_keyboard(city: str) -> InlineKeyboardMarkup:
         InlineKeyboardMarkup: Inline клавиатура
     """
     builder = InlineKeyboardBuilder()
+    city_bytes = city.encode()
 
-    builder.add(
-        InlineKeyboardButton(
-            text="🔄 Обновить", callback_data=f"refresh_weather:{city}"
-        )
-    )
-
-    builder.add(
-        InlineKeyboardButton(text="📅 Прогноз", callback_data=f"get_forecast:{city}")
-    )
-
-    builder.add(
-        InlineKeyboardButton(
-            text="⭐ В избранное", callback_data=f"add_favorite:{city}"
-        )
-    )
+    # Кнопки с городом в callback_data (длинные названия в лимит не влезают)
+    _add_city_button(builder, "🔄 Обновить", "refresh_weather", city_bytes)
+    _add_city_button(builder, "📅 Прогноз", "forecast", city_bytes)
+    _add_city_button(builder, "⭐ В избранное", "favorite", city_bytes)
 
     builder.add(
         InlineKeyboardButton(
@@ -186,6 +247,7 @@ def get_inline_weather_keyboard(city: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
+@functools.lru_cache(maxsize=512)
 def get_inline_forecast_keyboard(city: str) -> InlineKeyboardMarkup:
     """
     Inline клавиатура для прогноза
@@ -197,22 +259,12 @@ def get_inline_forecast_keyboard(city: str) -> InlineKeyboardMarkup:
         InlineKeyboardMarkup: Inline клавиатура
     """
     builder = InlineKeyboardBuilder()
+    city_bytes = city.encode()
 
-    builder.add(
-        InlineKeyboardButton(text="🌡️ Сейчас", callback_data=f"current_weather:{city}")
-    )
-
-    builder.add(
-        InlineKeyboardButton(
-            text="🔄 Обновить прогноз", callback_data=f"refresh_forecast:{city}"
-        )
-    )
-
-    builder.add(
-        InlineKeyboardButton(
-            text="⭐ В избранное", callback_data=f"add_favorite:{city}"
-        )
-    )
+    # Кнопки с городом в callback_data (длинные названия в лимит не влезают)
+    _add_city_button(builder, "🌡️ Сейчас", "current_weather", city_bytes)
+    _add_city_button(builder, "🔄 Обновить прогноз", "refresh_forecast", city_bytes)
+    _add_city_button(builder, "⭐ В избранное", "favorite", city_bytes)
 
     builder.add(
         InlineKeyboardButton(
@@ -225,7 +277,7 @@ def get_inline_forecast_keyboard(city: str) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_units_keyboard() -> InlineKeyboardMarkup:
+def _build_units_keyboard() -> InlineKeyboardMarkup:
     """
     Клавиатура выбора единиц измерения
 
@@ -251,7 +303,7 @@ def get_units_keyboard() -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def get_language_keyboard() -> InlineKeyboardMarkup:
+def _build_language_keyboard() -> InlineKeyboardMarkup:
     """
     Клавиатура выбора языка
 
@@ -271,3 +323,42 @@ def get_language_keyboard() -> InlineKeyboardMarkup:
     builder.adjust(2, 2)
 
     return builder.as_markup()
+
+
+# Статические клавиатуры неизменны - собираем их один раз при импорте
+_MAIN_KB = _build_main_keyboard()
+_WEATHER_KB = _build_weather_keyboard()
+_FORECAST_KB = _build_forecast_keyboard()
+_SETTINGS_KB = _build_settings_keyboard()
+_UNITS_KB = _build_units_keyboard()
+_LANGUAGE_KB = _build_language_keyboard()
+
+
+def get_main_keyboard() -> ReplyKeyboardMarkup:
+    """Основная клавиатура"""
+    return _MAIN_KB
+
+
+def get_weather_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура для раздела текущей погоды"""
+    return _WEATHER_KB
+
+
+def get_forecast_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура для раздела прогноза"""
+    return _FORECAST_KB
+
+
+def get_settings_keyboard() -> ReplyKeyboardMarkup:
+    """Клавиатура настроек"""
+    return _SETTINGS_KB
+
+
+def get_units_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура выбора единиц измерения"""
+    return _UNITS_KB
+
+
+def get_language_keyboard() -> InlineKeyboardMarkup:
+    """Клавиатура выбора языка"""
+    return _LANGUAGE_KB
@@ -6,14 +6,28 @@
 
 import asyncio
 import logging
-from aiogram import Bot, Dispatcher, F
+import re
+from typing import Dict, Final, Optional, Tuple
+from aiohttp import web
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.filters import CommandStart, Command
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.memory import SimpleEventIsolation
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него aiogram использует json
+    orjson = None
+
+from cache import TTLCache
 from config import Config
+from fsm_storage import ExpiringMemoryStorage
+from storage import FavoritesStorage
 from weather_service import WeatherService
 from keyboards import (
     get_main_keyboard, 
@@ -23,10 +37,23 @@ from keyboards import (
     get_inline_weather_keyboard,
     get_inline_forecast_keyboard,
     get_units_keyboard,
-    get_language_keyboard
+    get_language_keyboard,
+    BTN_CURRENT,
+    BTN_FORECAST5,
+    BTN_FAVORITES,
+    BTN_SETTINGS,
+    BTN_HELP,
+    BTN_ABOUT,
+    BTN_MAIN_MENU,
+    BTN_TO_MENU,
+    BTN_BACK,
+    BTN_ADD_CITY,
+    BTN_CLEAR,
+    FAVORITE_CITY_PREFIX
 )
-from utils import format_weather_message, format_forecast_message
+from utils import compact_text, format_weather_message, format_forecast_message
 from decorators import error_handler
+from middlewares import ConcurrencyLimitMiddleware, ErrorHandlerMiddleware
 
 
 # Настройка логирования
@@ -37,6 +64,123 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _orjson_dumps(obj) -> str:
+    """Сериализация JSON через orjson (aiogram ожидает str)"""
+    return orjson.dumps(obj).decode()
+
+
+def _create_bot_session() -> AiohttpSession:
+    """HTTP сессия бота с быстрым JSON, если установлен orjson"""
+    if orjson is None:
+        return AiohttpSession()
+    return AiohttpSession(json_loads=orjson.loads, json_dumps=_orjson_dumps)
+
+
+# Статические тексты сообщений (HTML), очищенные от лишних пробелов при импорте
+WELCOME_TEXT: Final = compact_text(
+    "🌤️ <b>Добро пожаловать в Weather Bot!</b>\n\n"
+    "Я помогу вам узнать актуальную погоду и прогноз для любого города мира.\n\n"
+    "📍 <b>Доступные команды:</b>\n"
+    "• /weather - текущая погода\n"
+    "• /forecast - прогноз на 5 дней\n"
+    "• /help - помощь\n\n"
+    "Выберите действие из меню ниже:"
+)
+
+HELP_TEXT: Final = compact_text(
+    "🆘 <b>Помощь по боту</b>\n\n"
+    "🌡️ <b>Текущая погода</b> - получить актуальную погоду для города\n"
+    "📅 <b>Прогноз на 5 дней</b> - подробный прогноз погоды\n"
+    "📍 <b>Избранные города</b> - сохраните часто используемые города\n"
+    "⚙️ <b>Настройки</b> - настройка единиц измерения и языка\n\n"
+    "💡 <b>Как пользоваться:</b>\n"
+    "1. Нажмите нужную кнопку в меню\n"
+    "2. Введите название города\n"
+    "3. Получите результат!\n\n"
+    "🏙️ <b>Примеры городов:</b>\n"
+    "• Москва, Санкт-Петербург\n"
+    "• London, New York\n"
+    "• Париж, Берлин\n\n"
+    "Бот поддерживает города на русском и английском языках."
+)
+
+ABOUT_TEXT: Final = compact_text(
+    "📊 <b>О Weather Bot</b>\n\n"
+    "🤖 <b>Версия:</b> 1.0.0\n"
+    "📅 <b>Дата создания:</b> Июнь 2025\n"
+    "🌍 <b>API:</b> OpenWeatherMap\n"
+    "⚡ <b>Технологии:</b> aiogram 3.x, Python 3.9+\n\n"
+    "✨ <b>Возможности:</b>\n"
+    "• Текущая погода для любого города\n"
+    "• Прогноз на 5 дней с 3-часовым интервалом\n"
+    "• Сохранение избранных городов\n"
+    "• Настройка единиц измерения\n"
+    "• Многоязычная поддержка\n\n"
+    "🔄 <b>Обновления погоды:</b> в реальном времени\n"
+    "📊 <b>Данные предоставлены:</b> OpenWeatherMap\n\n"
+    "💬 Бот работает 24/7 и готов помочь вам с прогнозом погоды!"
+)
+
+SETTINGS_TEXT: Final = compact_text(
+    "⚙️ <b>Настройки бота</b>\n\n"
+    "Здесь вы можете настроить работу бота под себя:\n\n"
+    "🌡️ <b>Единицы измерения</b> - Цельсий, Фаренгейт или Кельвин\n"
+    "🌍 <b>Язык</b> - язык интерфейса и данных\n"
+    "🔔 <b>Уведомления</b> - настройка push-уведомлений\n"
+    "📍 <b>Местоположение</b> - автоопределение города\n\n"
+    "Выберите раздел для настройки:"
+)
+
+BACK_TO_MENU_TEXT: Final = compact_text(
+    "🏠 <b>Главное меню</b>\n\n"
+    "Выберите действие:"
+)
+
+REQUEST_CITY_WEATHER_TEXT: Final = compact_text(
+    "🏙️ <b>Текущая погода</b>\n\n"
+    "Введите название города для получения актуальной информации о погоде:"
+)
+
+REQUEST_CITY_FORECAST_TEXT: Final = compact_text(
+    "📅 <b>Прогноз погоды</b>\n\n"
+    "Введите название города для получения прогноза на 5 дней:"
+)
+
+NO_FAVORITES_TEXT: Final = compact_text(
+    "📍 <b>Избранные города</b>\n\n"
+    "У вас пока нет сохраненных городов.\n"
+    "Добавьте город, чтобы быстро получать прогноз погоды!"
+)
+
+ADD_FAVORITE_PROMPT: Final = compact_text(
+    "🏙️ <b>Добавление города в избранное</b>\n\n"
+    "Введите название города, который хотите добавить в избранное:"
+)
+
+# Статические клавиатуры (keyboards.py возвращает один и тот же экземпляр)
+MAIN_KB = get_main_keyboard()
+FORECAST_KB = get_forecast_keyboard()
+SETTINGS_KB = get_settings_keyboard()
+
+# Кнопки главного меню -> имя метода-обработчика WeatherBot
+MENU_ROUTES: Dict[str, str] = {
+    BTN_CURRENT: "menu_current_weather",
+    BTN_FORECAST5: "menu_forecast",
+    BTN_FAVORITES: "menu_favorites",
+    BTN_SETTINGS: "menu_settings",
+    BTN_HELP: "menu_help",
+    BTN_ABOUT: "menu_about",
+}
+MENU_BUTTONS = frozenset(MENU_ROUTES)
+
+# Кнопки возврата в главное меню
+BACK_BUTTONS = frozenset({BTN_MAIN_MENU, BTN_TO_MENU, BTN_BACK})
+
+# Допустимое название города: отсекаем мусорный ввод до запроса к API
+_CITY_RE = re.compile(r"[\w\s\-.,'’()а-яА-ЯёЁ]{2,64}")
+INVALID_CITY_TEXT: Final = "❌ Некорректное название города"
+
+
 class WeatherStates(StatesGroup):
     waiting_for_city = State()
     waiting_for_forecast_city = State()
@@ -46,68 +190,218 @@ class WeatherStates(StatesGroup):
 class WeatherBot:
     def __init__(self):
         self.config = Config()
-        self.bot = Bot(token=self.config.bot_token)
-        self.dp = Dispatcher(storage=MemoryStorage())
+        self.bot = Bot(token=self.config.bot_token, session=_create_bot_session())
+        # Состояния FSM в памяти с удалением записей неактивных пользователей
+        self.fsm_storage = ExpiringMemoryStorage(
+            ttl=self.config.fsm_state_ttl,
+            sweep_interval=self.config.fsm_sweep_interval
+        )
+        # Апдейты одного чата обрабатываются по порядку: блокировка чата
+        # берется до чтения состояния FSM, поэтому следующий апдейт видит
+        # состояние, установленное предыдущим
+        self.dp = Dispatcher(storage=self.fsm_storage, events_isolation=SimpleEventIsolation())
+        self.router = Router(name="weather_bot")
         self.weather_service = WeatherService(self.config.weather_api_key)
         
-        # Простое хранилище избранных городов (в реальном проекте - база данных)
-        self.user_favorites = {}
+        # Избранные города хранятся в SQLite и переживают перезапуск
+        self.favorites = FavoritesStorage(
+            self.config.database_path,
+            cache_size=self.config.favorites_cache_size
+        )
+        
+        # Данные кэширует WeatherService; здесь храним только готовый текст
+        # сообщения для закэшированных сервисом данных
+        self._weather_texts = TTLCache(self.config.cache_maxsize, self.config.weather_cache_ttl)
+        self._forecast_texts = TTLCache(self.config.cache_maxsize, self.config.forecast_cache_ttl)
+        self._sources = {
+            "weather": (self._weather_texts, self.weather_service.get_current_weather, format_weather_message),
+            "forecast": (self._forecast_texts, self.weather_service.get_forecast, format_forecast_message),
+        }
+        
+        # Действие из callback_data -> обработчик inline кнопки
+        self._callback_table = {
+            "refresh_weather": self._cb_refresh_weather,
+            "refresh_forecast": self._cb_refresh_forecast,
+            "get_forecast": self._cb_get_forecast,
+            "current_weather": self._cb_current_weather,
+            "add_favorite": self._cb_add_favorite,
+            "units": self._cb_units,
+            "lang": self._cb_lang,
+        }
         
         self._setup_handlers()
 
     def _setup_handlers(self):
-        """Регистрация обработчиков сообщений"""
+        """Регистрация обработчиков сообщений в роутере бота"""
+        # Разные чаты обрабатываются параллельно, но не больше лимита одновременно
+        self.dp.update.outer_middleware(
+            ConcurrencyLimitMiddleware(self.config.max_concurrent_updates)
+        )
+        
+        # Ошибки хэндлеров с @error_handler обрабатываются в одном месте
+        error_middleware = ErrorHandlerMiddleware()
+        self.router.message.middleware(error_middleware)
+        self.router.callback_query.middleware(error_middleware)
+        
         # Команды
-        self.dp.message.register(self.start_handler, CommandStart())
-        self.dp.message.register(self.help_handler, Command("help"))
-        self.dp.message.register(self.weather_handler, Command("weather"))
-        self.dp.message.register(self.forecast_handler, Command("forecast"))
-        
-        # Кнопки главного меню
-        self.dp.message.register(self.menu_current_weather, F.text == "🌡️ Текущая погода")
-        self.dp.message.register(self.menu_forecast, F.text == "📅 Прогноз на 5 дней")
-        self.dp.message.register(self.menu_favorites, F.text == "📍 Избранные города")
-        self.dp.message.register(self.menu_settings, F.text == "⚙️ Настройки")
-        self.dp.message.register(self.menu_help, F.text == "ℹ️ Помощь")
-        self.dp.message.register(self.menu_about, F.text == "📊 О боте")
+        self.router.message.register(self.start_handler, CommandStart())
+        self.router.message.register(self.help_handler, Command("help"))
+        self.router.message.register(self.weather_handler, Command("weather"))
+        self.router.message.register(self.forecast_handler, Command("forecast"))
+        
+        # Кнопки главного меню (один фильтр и выбор метода по словарю)
+        self.router.message.register(self.menu_dispatch, F.text.in_(MENU_BUTTONS))
         
         # Кнопки возврата
-        self.dp.message.register(self.back_to_menu, F.text.in_(["🔙 В главное меню", "🔙 В меню", "🔙 Назад"]))
+        self.router.message.register(self.back_to_menu, F.text.in_(BACK_BUTTONS))
         
         # Кнопки избранного
-        self.dp.message.register(self.add_favorite_city, F.text == "➕ Добавить город")
-        self.dp.message.register(self.clear_favorites, F.text == "🗑️ Очистить все")
+        self.router.message.register(self.add_favorite_city, F.text == BTN_ADD_CITY)
+        self.router.message.register(self.clear_favorites, F.text == BTN_CLEAR)
         
         # Обработка избранных городов (начинающихся с 📍)
-        self.dp.message.register(self.handle_favorite_city, F.text.startswith("📍 "))
+        self.router.message.register(self.handle_favorite_city, F.text.startswith(FAVORITE_CITY_PREFIX))
         
         # Состояния ввода
-        self.dp.message.register(self.process_city_weather, WeatherStates.waiting_for_city)
-        self.dp.message.register(self.process_city_forecast, WeatherStates.waiting_for_forecast_city)
-        self.dp.message.register(self.process_add_favorite, WeatherStates.waiting_for_favorite_city)
+        self.router.message.register(self.process_city_weather, WeatherStates.waiting_for_city)
+        self.router.message.register(self.process_city_forecast, WeatherStates.waiting_for_forecast_city)
+        self.router.message.register(self.process_add_favorite, WeatherStates.waiting_for_favorite_city)
         
         # Inline кнопки (callback queries)
-        self.dp.callback_query.register(self.handle_callback)
+        self.router.callback_query.register(self.handle_callback)
+        
+        # Роутер подключается к диспетчеру один раз
+        self.dp.include_router(self.router)
+        
+        # Жизненный цикл (работает и для polling, и для webhook)
+        self.dp.startup.register(self._on_startup)
+        self.dp.shutdown.register(self._on_shutdown)
+
+    async def _on_startup(self):
+        """Подготовка ресурсов перед приёмом апдейтов"""
+        await self.favorites.connect()
+        await self.weather_service.start()
+        self.fsm_storage.start()
+
+    async def _on_shutdown(self):
+        """Освобождение ресурсов при остановке"""
+        await self.favorites.close()
+        await self.fsm_storage.close()
+
+    async def _fetch(self, kind: str, city: str) -> Optional[Tuple[Dict, str]]:
+        """
+        Получение данных и текста сообщения
+        
+        Данные берутся из WeatherService (кэш и объединение одновременных
+        запросов - там); текст форматируется один раз на каждый ответ API.
+        
+        Args:
+            kind (str): Тип запроса: "weather" или "forecast"
+            city (str): Название города
+            
+        Returns:
+            Optional[Tuple[Dict, str]]: (данные, текст сообщения) или None
+        """
+        texts, fetch, formatter = self._sources[kind]
+        data = await fetch(city)
+        if not data:
+            return None
+        
+        key = (kind, city.strip().casefold(), self.config.default_units, self.config.default_language)
+        cached = texts.get(key)
+        # Текст актуален, только пока сервис отдает тот же объект данных
+        if cached is None or cached[0] is not data:
+            cached = (data, formatter(data))
+            texts.set(key, cached)
+        return cached
+
+    async def _read_city(
+        self,
+        message: Message,
+        state: FSMContext,
+        prefix: str = ""
+    ) -> Optional[str]:
+        """
+        Чтение и проверка названия города из сообщения
+        
+        Состояние FSM сбрасывается только для корректного ввода, поэтому
+        после опечатки (или стикера вместо текста) можно сразу ввести город заново.
+        
+        Args:
+            message (Message): Сообщение пользователя
+            state (FSMContext): Состояние FSM
+            prefix (str): Префикс кнопки, который нужно отбросить
+            
+        Returns:
+            Optional[str]: Название города или None, если ввод некорректен
+        """
+        city = (message.text or "")[len(prefix):].strip()
+        if not _CITY_RE.fullmatch(city):
+            await message.answer(INVALID_CITY_TEXT)
+            return None
+        
+        # Сбрасываем состояние сразу, не дожидаясь ответа API
+        await state.clear()
+        return city
+
+    async def _safe_fetch(
+        self,
+        kind: str,
+        city: str,
+        loading_msg: Message,
+        not_found_text: Optional[str] = None,
+        error_hint: str = "Попробуйте позже."
+    ) -> Optional[Tuple[Dict, str]]:
+        """
+        Запрос данных с единой обработкой ошибок для хэндлеров сообщений
+        
+        Если город не найден или запрос завершился ошибкой, сообщение-заглушка
+        loading_msg заменяется соответствующим текстом.
+        
+        Args:
+            kind (str): Тип запроса: "weather" или "forecast"
+            city (str): Название города
+            loading_msg (Message): Сообщение "Получаю данные..."
+            not_found_text (Optional[str]): Текст, если город не найден
+            error_hint (str): Подсказка в сообщении об ошибке
+            
+        Returns:
+            Optional[Tuple[Dict, str]]: (данные, текст сообщения) или None
+        """
+        try:
+            cached = await self._fetch(kind, city)
+        except Exception as e:
+            logger.error("Ошибка получения данных (%s) для %s: %s", kind, city, e)
+            await loading_msg.edit_text(
+                "⚠️ <b>Произошла ошибка</b>\n\n" + error_hint,
+                parse_mode='HTML'
+            )
+            return None
+        
+        if not cached:
+            await loading_msg.edit_text(
+                not_found_text or (
+                    f"❌ <b>Город '{city}' не найден</b>\n\n"
+                    "Проверьте правильность написания и попробуйте снова."
+                ),
+                parse_mode='HTML'
+            )
+        return cached
+
+    @error_handler
+    async def menu_dispatch(self, message: Message, state: FSMContext):
+        """Обработчик всех кнопок главного меню"""
+        await getattr(self, MENU_ROUTES[message.text])(message, state)
 
     @error_handler
     async def start_handler(self, message: Message, state: FSMContext):
         """Обработчик команды /start"""
         await state.clear()
         
-        welcome_text = (
-            "🌤️ <b>Добро пожаловать в Weather Bot!</b>\n\n"
-            "Я помогу вам узнать актуальную погоду и прогноз для любого города мира.\n\n"
-            "📍 <b>Доступные команды:</b>\n"
-            "• /weather - текущая погода\n"
-            "• /forecast - прогноз на 5 дней\n"
-            "• /help - помощь\n\n"
-            "Выберите действие из меню ниже:"
-        )
-        
         await message.answer(
-            welcome_text,
+            WELCOME_TEXT,
             parse_mode='HTML',
-            reply_markup=get_main_keyboard()
+            reply_markup=MAIN_KB
         )
 
     @error_handler
@@ -124,27 +418,10 @@ class WeatherBot:
 
     async def _send_help(self, message: Message):
         """Отправка справки"""
-        help_text = (
-            "🆘 <b>Помощь по боту</b>\n\n"
-            "🌡️ <b>Текущая погода</b> - получить актуальную погоду для города\n"
-            "📅 <b>Прогноз на 5 дней</b> - подробный прогноз погоды\n"
-            "📍 <b>Избранные города</b> - сохраните часто используемые города\n"
-            "⚙️ <b>Настройки</b> - настройка единиц измерения и языка\n\n"
-            "💡 <b>Как пользоваться:</b>\n"
-            "1. Нажмите нужную кнопку в меню\n"
-            "2. Введите название города\n"
-            "3. Получите результат!\n\n"
-            "🏙️ <b>Примеры городов:</b>\n"
-            "• Москва, Санкт-Петербург\n"
-            "• London, New York\n"
-            "• Париж, Берлин\n\n"
-            "Бот поддерживает города на русском и английском языках."
-        )
-        
         await message.answer(
-            help_text,
+            HELP_TEXT,
             parse_mode='HTML',
-            reply_markup=get_main_keyboard()
+            reply_markup=MAIN_KB
         )
 
     @error_handler
@@ -152,27 +429,10 @@ class WeatherBot:
         """Обработчик кнопки 'О боте'"""
         await state.clear()
         
-        about_text = (
-            "📊 <b>О Weather Bot</b>\n\n"
-            "🤖 <b>Версия:</b> 1.0.0\n"
-            "📅 <b>Дата создания:</b> Июнь 2025\n"
-            "🌍 <b>API:</b> OpenWeatherMap\n"
-            "⚡ <b>Технологии:</b> aiogram 3.x, Python 3.9+\n\n"
-            "✨ <b>Возможности:</b>\n"
-            "• Текущая погода для любого города\n"
-            "• Прогноз на 5 дней с 3-часовым интервалом\n"
-            "• Сохранение избранных городов\n"
-            "• Настройка единиц измерения\n"
-            "• Многоязычная поддержка\n\n"
-            "🔄 <b>Обновления погоды:</b> в реальном времени\n"
-            "📊 <b>Данные предоставлены:</b> OpenWeatherMap\n\n"
-            "💬 Бот работает 24/7 и готов помочь вам с прогнозом погоды!"
-        )
-        
         await message.answer(
-            about_text,
+            ABOUT_TEXT,
             parse_mode='HTML',
-            reply_markup=get_main_keyboard()
+            reply_markup=MAIN_KB
         )
 
     @error_handler
@@ -189,11 +449,7 @@ class WeatherBot:
         """Запрос города для получения текущей погоды"""
         await state.set_state(WeatherStates.waiting_for_city)
         
-        await message.answer(
-            "🏙️ <b>Текущая погода</b>\n\n"
-            "Введите название города для получения актуальной информации о погоде:",
-            parse_mode='HTML'
-        )
+        await message.answer(REQUEST_CITY_WEATHER_TEXT, parse_mode='HTML')
 
     @error_handler
     async def forecast_handler(self, message: Message, state: FSMContext):
@@ -209,11 +465,7 @@ class WeatherBot:
         """Запрос города для получения прогноза"""
         await state.set_state(WeatherStates.waiting_for_forecast_city)
         
-        await message.answer(
-            "📅 <b>Прогноз погоды</b>\n\n"
-            "Введите название города для получения прогноза на 5 дней:",
-            parse_mode='HTML'
-        )
+        await message.answer(REQUEST_CITY_FORECAST_TEXT, parse_mode='HTML')
 
     @error_handler
     async def menu_favorites(self, message: Message, state: FSMContext):
@@ -221,7 +473,7 @@ class WeatherBot:
         await state.clear()
         
         user_id = message.from_user.id
-        favorites = self.user_favorites.get(user_id, [])
+        favorites = await self.favorites.get(user_id)
         
         if favorites:
             text = (
@@ -230,11 +482,7 @@ class WeatherBot:
                 "Нажмите на город для получения погоды или выберите действие:"
             )
         else:
-            text = (
-                "📍 <b>Избранные города</b>\n\n"
-                "У вас пока нет сохраненных городов.\n"
-                "Добавьте город, чтобы быстро получать прогноз погоды!"
-            )
+            text = NO_FAVORITES_TEXT
         
         await message.answer(
             text,
@@ -247,111 +495,83 @@ class WeatherBot:
         """Обработчик кнопки 'Добавить город'"""
         await state.set_state(WeatherStates.waiting_for_favorite_city)
         
-        await message.answer(
-            "🏙️ <b>Добавление города в избранное</b>\n\n"
-            "Введите название города, который хотите добавить в избранное:",
-            parse_mode='HTML'
-        )
+        await message.answer(ADD_FAVORITE_PROMPT, parse_mode='HTML')
 
     @error_handler
     async def process_add_favorite(self, message: Message, state: FSMContext):
         """Обработка добавления города в избранное"""
-        city = message.text.strip()
+        city = await self._read_city(message, state)
+        if city is None:
+            return
+        
         user_id = message.from_user.id
         
         # Проверяем, существует ли город (запрашиваем погоду)
         loading_msg = await message.answer("🔄 Проверяю город...")
         
-        try:
-            weather_data = await self.weather_service.get_current_weather(city)
-            
-            if weather_data:
-                # Город найден, добавляем в избранное
-                if user_id not in self.user_favorites:
-                    self.user_favorites[user_id] = []
-                
-                favorites = self.user_favorites[user_id]
-                
-                # Проверяем, нет ли уже такого города
-                city_name = weather_data.get('name', city)
-                if city_name not in favorites:
-                    if len(favorites) < 6:  # Ограничение на количество
-                        favorites.append(city_name)
-                        await loading_msg.edit_text(
-                            f"✅ <b>Город '{city_name}' добавлен в избранное!</b>\n\n"
-                            f"Всего избранных городов: {len(favorites)}",
-                            parse_mode='HTML'
-                        )
-                    else:
-                        await loading_msg.edit_text(
-                            "❌ <b>Превышен лимит</b>\n\n"
-                            "Можно сохранить максимум 6 городов. "
-                            "Удалите один из существующих городов.",
-                            parse_mode='HTML'
-                        )
-                else:
-                    await loading_msg.edit_text(
-                        f"ℹ️ <b>Город '{city_name}' уже в избранном</b>",
-                        parse_mode='HTML'
-                    )
-                
-                # Показываем обновленный список избранного
-                await asyncio.sleep(2)
-                await message.answer(
-                    "📍 Ваши избранные города:",
-                    reply_markup=get_favorites_keyboard(self.user_favorites[user_id])
+        cached = await self._safe_fetch("weather", city, loading_msg)
+        if not cached:
+            return
+        
+        weather_data, _ = cached
+        # Город найден, добавляем в избранное
+        favorites = await self.favorites.get(user_id)
+        
+        # Сохраняем каноническое название из API, а не ввод пользователя,
+        # чтобы "moscow" и "Москва" не стали разными записями
+        city_name = weather_data.get('city') or city
+        if city_name not in favorites:
+            if len(favorites) < 6:  # Ограничение на количество
+                await self.favorites.add(user_id, city_name)
+                # Обновляем локальный список вместо повторного чтения из базы
+                favorites.append(city_name)
+                await loading_msg.edit_text(
+                    f"✅ <b>Город '{city_name}' добавлен в избранное!</b>\n\n"
+                    f"Всего избранных городов: {len(favorites)}",
+                    parse_mode='HTML'
                 )
-                
             else:
                 await loading_msg.edit_text(
-                    f"❌ <b>Город '{city}' не найден</b>\n\n"
-                    "Проверьте правильность написания и попробуйте снова.",
+                    "❌ <b>Превышен лимит</b>\n\n"
+                    "Можно сохранить максимум 6 городов. "
+                    "Удалите один из существующих городов.",
                     parse_mode='HTML'
                 )
-                
-        except Exception as e:
-            logger.error(f"Ошибка добавления города в избранное: {e}")
+        else:
             await loading_msg.edit_text(
-                "⚠️ <b>Произошла ошибка</b>\n\n"
-                "Попробуйте позже.",
+                f"ℹ️ <b>Город '{city_name}' уже в избранном</b>",
                 parse_mode='HTML'
             )
         
-        await state.clear()
+        # Показываем обновленный список избранного
+        await message.answer(
+            "📍 Ваши избранные города:",
+            reply_markup=get_favorites_keyboard(favorites)
+        )
 
     @error_handler
     async def handle_favorite_city(self, message: Message, state: FSMContext):
         """Обработка нажатия на избранный город"""
-        await state.clear()
-        
-        # Извлекаем название города (убираем 📍 и пробел)
-        city = message.text[2:].strip()
+        # Название города без префикса 📍
+        city = await self._read_city(message, state, prefix=FAVORITE_CITY_PREFIX)
+        if city is None:
+            return
         
         loading_msg = await message.answer("🔄 Получаю данные о погоде...")
         
-        try:
-            weather_data = await self.weather_service.get_current_weather(city)
-            
-            if weather_data:
-                response_text = format_weather_message(weather_data)
-                await loading_msg.edit_text(
-                    response_text,
-                    parse_mode='HTML',
-                    reply_markup=get_inline_weather_keyboard(city)
-                )
-            else:
-                await loading_msg.edit_text(
-                    f"❌ <b>Не удалось получить погоду для '{city}'</b>",
-                    parse_mode='HTML'
-                )
-                
-        except Exception as e:
-            logger.error(f"Ошибка получения погоды для избранного города {city}: {e}")
-            await loading_msg.edit_text(
-                "⚠️ <b>Произошла ошибка</b>\n\n"
-                "Попробуйте позже.",
-                parse_mode='HTML'
-            )
+        cached = await self._safe_fetch(
+            "weather", city, loading_msg,
+            not_found_text=f"❌ <b>Не удалось получить погоду для '{city}'</b>"
+        )
+        if not cached:
+            return
+        
+        _, response_text = cached
+        await loading_msg.edit_text(
+            response_text,
+            parse_mode='HTML',
+            reply_markup=get_inline_weather_keyboard(city)
+        )
 
     @error_handler
     async def clear_favorites(self, message: Message, state: FSMContext):
@@ -360,8 +580,7 @@ class WeatherBot:
         
         user_id = message.from_user.id
         
-        if user_id in self.user_favorites:
-            del self.user_favorites[user_id]
+        await self.favorites.clear(user_id)
         
         await message.answer(
             "🗑️ <b>Избранные города очищены</b>\n\n"
@@ -375,20 +594,10 @@ class WeatherBot:
         """Обработчик кнопки 'Настройки'"""
         await state.clear()
         
-        settings_text = (
-            "⚙️ <b>Настройки бота</b>\n\n"
-            "Здесь вы можете настроить работу бота под себя:\n\n"
-            "🌡️ <b>Единицы измерения</b> - Цельсий, Фаренгейт или Кельвин\n"
-            "🌍 <b>Язык</b> - язык интерфейса и данных\n"
-            "🔔 <b>Уведомления</b> - настройка push-уведомлений\n"
-            "📍 <b>Местоположение</b> - автоопределение города\n\n"
-            "Выберите раздел для настройки:"
-        )
-        
         await message.answer(
-            settings_text,
+            SETTINGS_TEXT,
             parse_mode='HTML',
-            reply_markup=get_settings_keyboard()
+            reply_markup=SETTINGS_KB
         )
 
     @error_handler
@@ -397,212 +606,265 @@ class WeatherBot:
         await state.clear()
         
         await message.answer(
-            "🏠 <b>Главное меню</b>\n\n"
-            "Выберите действие:",
+            BACK_TO_MENU_TEXT,
             parse_mode='HTML',
-            reply_markup=get_main_keyboard()
+            reply_markup=MAIN_KB
         )
 
     @error_handler
     async def process_city_weather(self, message: Message, state: FSMContext):
         """Обработка запроса текущей погоды"""
-        city = message.text.strip()
+        city = await self._read_city(message, state)
+        if city is None:
+            return
         
         loading_msg = await message.answer("🔄 Получаю данные о погоде...")
         
-        try:
-            weather_data = await self.weather_service.get_current_weather(city)
-            
-            if weather_data:
-                response_text = format_weather_message(weather_data)
-                await loading_msg.edit_text(
-                    response_text,
-                    parse_mode='HTML',
-                    reply_markup=get_inline_weather_keyboard(city)
-                )
-                
-                # Показываем главное меню
-                await message.answer(
-                    "Выберите действие:",
-                    reply_markup=get_main_keyboard()
-                )
-            else:
-                await loading_msg.edit_text(
-                    f"❌ <b>Город '{city}' не найден</b>\n\n"
-                    "Проверьте правильность написания и попробуйте снова.",
-                    parse_mode='HTML'
-                )
-                
-        except Exception as e:
-            logger.error(f"Ошибка получения погоды для {city}: {e}")
-            await loading_msg.edit_text(
-                "⚠️ <b>Произошла ошибка</b>\n\n"
-                "Попробуйте позже или проверьте название города.",
-                parse_mode='HTML'
-            )
+        cached = await self._safe_fetch(
+            "weather", city, loading_msg,
+            error_hint="Попробуйте позже или проверьте название города."
+        )
+        if not cached:
+            return
         
-        await state.clear()
+        _, response_text = cached
+        await loading_msg.edit_text(
+            response_text,
+            parse_mode='HTML',
+            reply_markup=get_inline_weather_keyboard(city)
+        )
+        
+        # Показываем главное меню
+        await message.answer(
+            "Выберите действие:",
+            reply_markup=MAIN_KB
+        )
 
     @error_handler
     async def process_city_forecast(self, message: Message, state: FSMContext):
         """Обработка запроса прогноза погоды"""
-        city = message.text.strip()
+        city = await self._read_city(message, state)
+        if city is None:
+            return
         
         loading_msg = await message.answer("🔄 Получаю прогноз погоды...")
         
-        try:
-            forecast_data = await self.weather_service.get_forecast(city)
-            
-            if forecast_data:
-                response_text = format_forecast_message(forecast_data)
-                await loading_msg.edit_text(
-                    response_text,
-                    parse_mode='HTML',
-                    reply_markup=get_inline_forecast_keyboard(city)
-                )
-                
-                # Показываем меню прогноза
-                await message.answer(
-                    "Выберите действие:",
-                    reply_markup=get_forecast_keyboard()
-                )
-            else:
-                await loading_msg.edit_text(
-                    f"❌ <b>Город '{city}' не найден</b>\n\n"
-                    "Проверьте правильность написания и попробуйте снова.",
-                    parse_mode='HTML'
-                )
-                
-        except Exception as e:
-            logger.error(f"Ошибка получения прогноза для {city}: {e}")
-            await loading_msg.edit_text(
-                "⚠️ <b>Произошла ошибка</b>\n\n"
-                "Попробуйте позже или проверьте название города.",
-                parse_mode='HTML'
-            )
+        cached = await self._safe_fetch(
+            "forecast", city, loading_msg,
+            error_hint="Попробуйте позже или проверьте название города."
+        )
+        if not cached:
+            return
         
-        await state.clear()
+        _, response_text = cached
+        await loading_msg.edit_text(
+            response_text,
+            parse_mode='HTML',
+            reply_markup=get_inline_forecast_keyboard(city)
+        )
+        
+        # Показываем меню прогноза
+        await message.answer(
+            "Выберите действие:",
+            reply_markup=FORECAST_KB
+        )
 
     @error_handler
     async def handle_callback(self, callback: CallbackQuery, state: FSMContext):
         """Обработка inline кнопок"""
         data = callback.data
         
+        # callback_data имеет вид "<действие>:<значение>" - разбираем один раз.
+        # Ошибки обрабатывает ErrorHandlerMiddleware (alert "Произошла ошибка")
+        action, sep, value = data.partition(":")
+        handler = self._callback_table.get(action) if sep else None
+        
+        if handler is not None:
+            await handler(callback, value)
+        else:
+            await callback.answer("🤖 Функция в разработке")
+
+    async def _cb_refresh_weather(self, callback: CallbackQuery, city: str):
+        """Обновление сообщения с текущей погодой"""
+        cached = await self._fetch("weather", city)
+        
+        if cached:
+            _, response_text = cached
+            await self._edit_callback_message(
+                callback, response_text, get_inline_weather_keyboard(city), "🔄 Погода обновлена!"
+            )
+        else:
+            await callback.answer("❌ Ошибка обновления данных", show_alert=True)
+
+    async def _cb_refresh_forecast(self, callback: CallbackQuery, city: str):
+        """Обновление сообщения с прогнозом"""
+        cached = await self._fetch("forecast", city)
+        
+        if cached:
+            _, response_text = cached
+            await self._edit_callback_message(
+                callback, response_text, get_inline_forecast_keyboard(city), "🔄 Прогноз обновлен!"
+            )
+        else:
+            await callback.answer("❌ Ошибка обновления прогноза", show_alert=True)
+
+    async def _edit_callback_message(
+        self,
+        callback: CallbackQuery,
+        text: str,
+        reply_markup: InlineKeyboardMarkup,
+        done_text: str
+    ):
+        """
+        Редактирование сообщения с inline кнопкой, только если текст изменился
+        
+        Текст берется из кэша, поэтому в пределах TTL он совпадает с уже
+        показанным - тогда запрос edit_text к Telegram не отправляется.
+        """
+        if callback.message.html_text == text:
+            await callback.answer("✅ Данные актуальны")
+            return
+        
         try:
-            if data.startswith("refresh_weather:"):
-                city = data.split(":", 1)[1]
-                weather_data = await self.weather_service.get_current_weather(city)
-                
-                if weather_data:
-                    response_text = format_weather_message(weather_data)
-                    await callback.message.edit_text(
-                        response_text,
-                        parse_mode='HTML',
-                        reply_markup=get_inline_weather_keyboard(city)
-                    )
-                    await callback.answer("🔄 Погода обновлена!")
-                else:
-                    await callback.answer("❌ Ошибка обновления данных", show_alert=True)
-                    
-            elif data.startswith("refresh_forecast:"):
-                city = data.split(":", 1)[1]
-                forecast_data = await self.weather_service.get_forecast(city)
-                
-                if forecast_data:
-                    response_text = format_forecast_message(forecast_data)
-                    await callback.message.edit_text(
-                        response_text,
-                        parse_mode='HTML',
-                        reply_markup=get_inline_forecast_keyboard(city)
-                    )
-                    await callback.answer("🔄 Прогноз обновлен!")
-                else:
-                    await callback.answer("❌ Ошибка обновления прогноза", show_alert=True)
-                    
-            elif data.startswith("get_forecast:"):
-                city = data.split(":", 1)[1]
-                forecast_data = await self.weather_service.get_forecast(city)
-                
-                if forecast_data:
-                    response_text = format_forecast_message(forecast_data)
-                    await callback.message.answer(
-                        response_text,
-                        parse_mode='HTML',
-                        reply_markup=get_inline_forecast_keyboard(city)
-                    )
-                    await callback.answer()
-                else:
-                    await callback.answer("❌ Ошибка получения прогноза", show_alert=True)
-                    
-            elif data.startswith("current_weather:"):
-                city = data.split(":", 1)[1]
-                weather_data = await self.weather_service.get_current_weather(city)
-                
-                if weather_data:
-                    response_text = format_weather_message(weather_data)
-                    await callback.message.answer(
-                        response_text,
-                        parse_mode='HTML',
-                        reply_markup=get_inline_weather_keyboard(city)
-                    )
-                    await callback.answer()
-                else:
-                    await callback.answer("❌ Ошибка получения погоды", show_alert=True)
-                    
-            elif data.startswith("add_favorite:"):
-                city = data.split(":", 1)[1]
-                user_id = callback.from_user.id
-                
-                if user_id not in self.user_favorites:
-                    self.user_favorites[user_id] = []
-                
-                favorites = self.user_favorites[user_id]
-                
-                if city not in favorites:
-                    if len(favorites) < 6:
-                        favorites.append(city)
-                        await callback.answer(f"⭐ {city} добавлен в избранное!")
-                    else:
-                        await callback.answer("❌ Превышен лимит избранных городов (6)", show_alert=True)
-                else:
-                    await callback.answer(f"ℹ️ {city} уже в избранном")
-                    
-            elif data.startswith("units:"):
-                unit = data.split(":", 1)[1]
-                await callback.answer(f"🌡️ Единицы измерения: {unit}")
-                
-            elif data.startswith("lang:"):
-                lang = data.split(":", 1)[1]
-                await callback.answer(f"🌍 Язык изменен на: {lang}")
-                
+            await callback.message.edit_text(text, parse_mode='HTML', reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            # Разметка html_text могла отличаться, а содержимое - нет
+            if "message is not modified" not in str(e):
+                raise
+            await callback.answer("✅ Данные актуальны")
+            return
+        
+        await callback.answer(done_text)
+
+    async def _cb_get_forecast(self, callback: CallbackQuery, city: str):
+        """Отправка прогноза новым сообщением"""
+        cached = await self._fetch("forecast", city)
+        
+        if cached:
+            _, response_text = cached
+            await callback.message.answer(
+                response_text,
+                parse_mode='HTML',
+                reply_markup=get_inline_forecast_keyboard(city)
+            )
+            await callback.answer()
+        else:
+            await callback.answer("❌ Ошибка получения прогноза", show_alert=True)
+
+    async def _cb_current_weather(self, callback: CallbackQuery, city: str):
+        """Отправка текущей погоды новым сообщением"""
+        cached = await self._fetch("weather", city)
+        
+        if cached:
+            _, response_text = cached
+            await callback.message.answer(
+                response_text,
+                parse_mode='HTML',
+                reply_markup=get_inline_weather_keyboard(city)
+            )
+            await callback.answer()
+        else:
+            await callback.answer("❌ Ошибка получения погоды", show_alert=True)
+
+    async def _cb_add_favorite(self, callback: CallbackQuery, city: str):
+        """Добавление города в избранное"""
+        user_id = callback.from_user.id
+        
+        # Каноническое название города (данные обычно уже в кэше сервиса)
+        cached = await self._fetch("weather", city)
+        if cached:
+            city = cached[0].get('city') or city
+        
+        favorites = await self.favorites.get(user_id)
+        
+        if city not in favorites:
+            if len(favorites) < 6:
+                await self.favorites.add(user_id, city)
+                await callback.answer(f"⭐ {city} добавлен в избранное!")
             else:
-                await callback.answer("🤖 Функция в разработке")
-                
-        except Exception as e:
-            logger.error(f"Ошибка обработки callback {data}: {e}")
-            await callback.answer("❌ Произошла ошибка", show_alert=True)
+                await callback.answer("❌ Превышен лимит избранных городов (6)", show_alert=True)
+        else:
+            await callback.answer(f"ℹ️ {city} уже в избранном")
+
+    async def _cb_units(self, callback: CallbackQuery, unit: str):
+        """Выбор единиц измерения"""
+        await callback.answer(f"🌡️ Единицы измерения: {unit}")
+
+    async def _cb_lang(self, callback: CallbackQuery, lang: str):
+        """Выбор языка"""
+        await callback.answer(f"🌍 Язык изменен на: {lang}")
 
     async def start_polling(self):
         """Запуск бота"""
         logger.info("Запуск Weather Bot с полной поддержкой кнопок...")
         try:
-            await self.dp.start_polling(self.bot)
+            # Webhook от прошлого запуска в webhook-режиме блокирует getUpdates
+            await self.bot.delete_webhook()
+            # Подписываемся только на используемые типы апдейтов (message, callback_query)
+            await self.dp.start_polling(
+                self.bot,
+                polling_timeout=self.config.polling_timeout,
+                allowed_updates=self.dp.resolve_used_update_types()
+            )
         except Exception as e:
-            logger.error(f"Ошибка при запуске бота: {e}")
+            logger.error("Ошибка при запуске бота: %s", e)
         finally:
+            await self.weather_service.close()
+            await self.bot.session.close()
+
+    async def start_webhook(self):
+        """Запуск бота в режиме webhook (встроенный aiohttp-сервер aiogram)"""
+        logger.info("Запуск Weather Bot в режиме webhook...")
+        
+        app = web.Application()
+        SimpleRequestHandler(
+            dispatcher=self.dp,
+            bot=self.bot,
+            secret_token=self.config.webhook_secret
+        ).register(app, path=self.config.webhook_path)
+        setup_application(app, self.dp, bot=self.bot)
+        
+        runner = web.AppRunner(app)
+        try:
+            # setup() запускает startup-хуки диспетчера (база, HTTP сессия)
+            await runner.setup()
+            await self.bot.set_webhook(
+                f"{self.config.webhook_url}{self.config.webhook_path}",
+                secret_token=self.config.webhook_secret,
+                allowed_updates=self.dp.resolve_used_update_types()
+            )
+            site = web.TCPSite(runner, host=self.config.webapp_host, port=self.config.webapp_port)
+            await site.start()
+            
+            # Сервер работает в фоне до остановки процесса
+            await asyncio.Event().wait()
+        except Exception as e:
+            logger.error("Ошибка при запуске webhook: %s", e)
+        finally:
+            await runner.cleanup()
+            await self.weather_service.close()
             await self.bot.session.close()
 
 
 async def main():
     """Главная функция"""
     bot = WeatherBot()
-    await bot.start_polling()
+    if bot.config.webhook_url:
+        await bot.start_webhook()
+    else:
+        await bot.start_polling()
 
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        # uvloop - более быстрый цикл событий на libuv (недоступен на Windows)
+        from uvloop import run
+    except ImportError:
+        run = asyncio.run
+    
+    try:
+        run(main())
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e:
-        logger.error(f"Критическая ошибка: {e}")
+        logger.error("Критическая ошибка: %s", e)
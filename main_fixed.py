@@ -6,14 +6,15 @@
 
 import asyncio
 import logging
+from typing import Final
 from aiogram import Bot, Dispatcher
 from aiogram.filters import CommandStart, Command
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 
 from config import Config
+from fsm_storage import ExpiringMemoryStorage
 from weather_service import WeatherService
 from keyboards import get_main_keyboard
 from utils import format_weather_message, format_forecast_message
@@ -24,6 +25,45 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Статические тексты сообщений
+WELCOME_TEXT: Final = (
+    "🌤️ <b>Добро пожаловать в Weather Bot!</b>\n\n"
+    "Я помогу вам узнать актуальную погоду и прогноз для любого города мира.\n\n"
+    "📍 <b>Доступные команды:</b>\n"
+    "• /weather - текущая погода\n"
+    "• /forecast - прогноз на 5 дней\n"
+    "• /help - помощь\n\n"
+    "Выберите действие из меню ниже:"
+)
+
+HELP_TEXT: Final = (
+    "🆘 <b>Помощь по боту</b>\n\n"
+    "🌡️ <b>/weather</b> - получить текущую погоду\n"
+    "📅 <b>/forecast</b> - прогноз погоды на 5 дней\n\n"
+    "💡 <b>Как пользоваться:</b>\n"
+    "1. Выберите команду\n"
+    "2. Введите название города\n"
+    "3. Получите результат!\n\n"
+    "🏙️ <b>Примеры городов:</b>\n"
+    "• Москва\n"
+    "• London\n"
+    "• New York\n"
+    "• Париж"
+)
+
+REQUEST_CITY_WEATHER_TEXT: Final = (
+    "🏙️ <b>Текущая погода</b>\n\n"
+    "Введите название города для получения актуальной информации о погоде:"
+)
+
+REQUEST_CITY_FORECAST_TEXT: Final = (
+    "📅 <b>Прогноз погоды</b>\n\n"
+    "Введите название города для получения прогноза на 5 дней:"
+)
+
+# Клавиатура главного меню создается один раз
+MAIN_KB = get_main_keyboard()
+
 
 class WeatherStates(StatesGroup):
     waiting_for_city = State()
@@ -34,12 +74,19 @@ class WeatherBot:
     def __init__(self):
         self.config = Config()
         self.bot = Bot(token=self.config.bot_token)
-        self.dp = Dispatcher(storage=MemoryStorage())
+        # Состояния FSM в памяти с удалением записей неактивных пользователей
+        self.fsm_storage = ExpiringMemoryStorage(
+            ttl=self.config.fsm_state_ttl,
+            sweep_interval=self.config.fsm_sweep_interval
+        )
+        self.dp = Dispatcher(storage=self.fsm_storage)
         self.weather_service = WeatherService(self.config.weather_api_key)
         self._setup_handlers()
 
     def _setup_handlers(self):
         """Регистрация обработчиков сообщений"""
+        self.dp.startup.register(self._on_startup)
+        self.dp.shutdown.register(self._on_shutdown)
         self.dp.message.register(self.start_handler, CommandStart())
         self.dp.message.register(self.help_handler, Command("help"))
         self.dp.message.register(self.weather_handler, Command("weather"))
@@ -51,24 +98,20 @@ class WeatherBot:
             self.process_city_forecast, WeatherStates.waiting_for_forecast_city
         )
 
+    async def _on_startup(self):
+        """Запуск фоновой очистки состояний FSM"""
+        self.fsm_storage.start()
+
+    async def _on_shutdown(self):
+        """Остановка фоновой очистки состояний FSM"""
+        await self.fsm_storage.close()
+
     async def start_handler(self, message: Message, state: FSMContext):
         """Обработчик команды /start"""
         try:
             await state.clear()
 
-            welcome_text = (
-                "🌤️ <b>Добро пожаловать в Weather Bot!</b>\n\n"
-                "Я помогу вам узнать актуальную погоду и прогноз для любого города мира.\n\n"
-                "📍 <b>Доступные команды:</b>\n"
-                "• /weather - текущая погода\n"
-                "• /forecast - прогноз на 5 дней\n"
-                "• /help - помощь\n\n"
-                "Выберите действие из меню ниже:"
-            )
-
-            await message.answer(
-                welcome_text, parse_mode="HTML", reply_markup=get_main_keyboard()
-            )
+            await message.answer(WELCOME_TEXT, parse_mode="HTML", reply_markup=MAIN_KB)
         except Exception as e:
             logger.error(f"Ошибка в start_handler: {e}")
             await message.answer("Произошла ошибка. Попробуйте позже.")
@@ -78,24 +121,7 @@ class WeatherBot:
         try:
             await state.clear()
 
-            help_text = (
-                "🆘 <b>Помощь по боту</b>\n\n"
-                "🌡️ <b>/weather</b> - получить текущую погоду\n"
-                "📅 <b>/forecast</b> - прогноз погоды на 5 дней\n\n"
-                "💡 <b>Как пользоваться:</b>\n"
-                "1. Выберите команду\n"
-                "2. Введите название города\n"
-                "3. Получите результат!\n\n"
-                "🏙️ <b>Примеры городов:</b>\n"
-                "• Москва\n"
-                "• London\n"
-                "• New York\n"
-                "• Париж"
-            )
-
-            await message.answer(
-                help_text, parse_mode="HTML", reply_markup=get_main_keyboard()
-            )
+            await message.answer(HELP_TEXT, parse_mode="HTML", reply_markup=MAIN_KB)
         except Exception as e:
             logger.error(f"Ошибка в help_handler: {e}")
             await message.answer("Произошла ошибка. Попробуйте позже.")
@@ -105,11 +131,7 @@ class WeatherBot:
         try:
             await state.set_state(WeatherStates.waiting_for_city)
 
-            await message.answer(
-                "🏙️ <b>Текущая погода</b>\n\n"
-                "Введите название города для получения актуальной информации о погоде:",
-                parse_mode="HTML",
-            )
+            await message.answer(REQUEST_CITY_WEATHER_TEXT, parse_mode="HTML")
         except Exception as e:
             logger.error(f"Ошибка в weather_handler: {e}")
             await message.answer("Произошла ошибка. Попробуйте позже.")
@@ -119,11 +141,7 @@ class WeatherBot:
         try:
             await state.set_state(WeatherStates.waiting_for_forecast_city)
 
-            await message.answer(
-                "📅 <b>Прогноз погоды</b>\n\n"
-                "Введите название города для получения прогноза на 5 дней:",
-                parse_mode="HTML",
-            )
+            await message.answer(REQUEST_CITY_FORECAST_TEXT, parse_mode="HTML")
         except Exception as e:
             logger.error(f"Ошибка в forecast_handler: {e}")
             await message.answer("Произошла ошибка. Попробуйте позже.")
@@ -190,10 +208,16 @@ class WeatherBot:
         """Запуск бота"""
         logger.info("Запуск Weather Bot...")
         try:
-            await self.dp.start_polling(self.bot)
+            # Подписываемся только на используемые типы апдейтов
+            await self.dp.start_polling(
+                self.bot,
+                polling_timeout=self.config.polling_timeout,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
         except Exception as e:
             logger.error(f"Ошибка при запуске бота: {e}")
         finally:
+            await self.weather_service.close()
             await self.bot.session.close()
 
 
@@ -205,7 +229,13 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        # uvloop - более быстрый цикл событий на libuv (недоступен на Windows)
+        from uvloop import run
+    except ImportError:
+        run = asyncio.run
+
+    try:
+        run(main())
     except KeyboardInterrupt:
         logger.info("Бот остановлен пользователем")
     except Exception as e:
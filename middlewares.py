@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Middleware для диспетчера бота
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class ErrorHandlerMiddleware(BaseMiddleware):
+    """
+    Единая точка обработки ошибок хэндлеров, помеченных @error_handler
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            callback = getattr(data.get("handler"), "callback", None)
+            if not getattr(callback, "_wants_error_wrap", False):
+                raise
+
+            logger.error("Ошибка в %s: %s", callback.__name__, e)
+
+            try:
+                if isinstance(event, Message):
+                    await event.answer(
+                        "⚠️ <b>Произошла ошибка</b>\n\n"
+                        "Попробуйте повторить запрос позже.",
+                        parse_mode="HTML",
+                    )
+                elif isinstance(event, CallbackQuery):
+                    # Без ответа на callback кнопка "зависает" у пользователя
+                    await event.answer("❌ Произошла ошибка", show_alert=True)
+            except Exception:
+                pass
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничение общего числа одновременно выполняемых хэндлеров
+
+    aiogram запускает каждый апдейт отдельной задачей, поэтому разные чаты
+    обрабатываются параллельно. Порядок апдейтов одного чата обеспечивает
+    events_isolation диспетчера: блокировка чата берется до чтения состояния FSM.
+    """
+
+    def __init__(self, max_concurrency: int = 64):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
@@ -15,7 +15,7 @@ if not os.path.exists('.env'):
     sys.exit(1)
 
 # Проверяем наличие всех модулей
-required_modules = ['config', 'weather_service', 'keyboards', 'utils', 'decorators']
+required_modules = ['config', 'weather_service', 'keyboards', 'utils', 'decorators', 'middlewares', 'cache', 'storage', 'fsm_storage']
 missing_modules = []
 
 for module in required_modules:
@@ -35,6 +35,10 @@ if missing_modules:
 try:
     from config import Config
     config = Config()
+    # Токены читаются лениво: обращаемся к ним сразу, чтобы увидеть,
+    # какой переменной окружения не хватает
+    config.bot_token
+    config.weather_api_key
     print("✅ Конфигурация загружена")
     
     if config.validate_config():
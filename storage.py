@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Хранилище избранных городов пользователей
+"""
+
+import logging
+from typing import List, Optional
+
+import aiosqlite
+
+from cache import TTLCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class FavoritesStorage:
+    """Избранные города в SQLite с небольшим кэшем в памяти"""
+
+    def __init__(
+        self,
+        db_path: str,
+        max_favorites: int = 6,
+        cache_size: int = 10_000,
+        cache_ttl: float = 60,
+    ):
+        self.db_path = db_path
+        self.max_favorites = max_favorites
+        self._db: Optional[aiosqlite.Connection] = None
+        # Кэш списков избранного, чтобы не ходить в SQLite при каждом открытии меню.
+        # Размер ограничен: давно не заходившие пользователи вытесняются (LRU)
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @property
+    def cache_evictions(self) -> int:
+        """Число пользователей, вытесненных из кэша по размеру"""
+        return self._cache.evictions
+
+    async def connect(self):
+        """Открытие базы данных и создание таблицы"""
+        self._db = await aiosqlite.connect(self.db_path)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        await self._db.execute("PRAGMA synchronous=NORMAL")
+        await self._db.execute(
+            "CREATE TABLE IF NOT EXISTS favorites ("
+            "user_id INTEGER NOT NULL, "
+            "city TEXT NOT NULL, "
+            "PRIMARY KEY (user_id, city))"
+        )
+        await self._db.commit()
+        logger.info("База избранных городов открыта: %s", self.db_path)
+
+    async def close(self):
+        """Закрытие базы данных"""
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+            logger.info("База избранных закрыта, вытеснений из кэша: %s", self.cache_evictions)
+
+    async def get(self, user_id: int) -> List[str]:
+        """
+        Получение избранных городов пользователя
+
+        Args:
+            user_id (int): ID пользователя Telegram
+
+        Returns:
+            List[str]: Города в порядке добавления
+        """
+        cities = self._cache.get(user_id)
+        if cities is None:
+            async with self._db.execute(
+                "SELECT city FROM favorites WHERE user_id = ? ORDER BY rowid LIMIT ?",
+                (user_id, self.max_favorites),
+            ) as cursor:
+                cities = tuple(row[0] for row in await cursor.fetchall())
+            self._cache.set(user_id, cities)
+        return list(cities)
+
+    async def add(self, user_id: int, city: str):
+        """
+        Добавление города в избранное (повторное добавление игнорируется)
+
+        Args:
+            user_id (int): ID пользователя Telegram
+            city (str): Название города
+        """
+        await self._db.execute(
+            "INSERT OR IGNORE INTO favorites (user_id, city) VALUES (?, ?)",
+            (user_id, city),
+        )
+        await self._db.commit()
+        self._cache.pop(user_id)
+
+    async def clear(self, user_id: int):
+        """
+        Удаление всех избранных городов пользователя
+
+        Args:
+            user_id (int): ID пользователя Telegram
+        """
+        await self._db.execute("DELETE FROM favorites WHERE user_id = ?", (user_id,))
+        await self._db.commit()
+        self._cache.pop(user_id)
+
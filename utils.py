@@ -4,12 +4,121 @@
 Утилиты для форматирования сообщений
 """
 
-from datetime import datetime
+import functools
+import re
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Dict, List
-import pytz
 
 # from weather_service import WeatherService  # Избегаем циклического импорта
 
+# Три и более перевода строки подряд
+_EXTRA_NEWLINES_RE = re.compile(r'\n{3,}')
+
+
+def compact_text(text: str) -> str:
+    """
+    Удаление лишних пробелов и пустых строк из текста сообщения
+    
+    Предназначено для статических текстов: вызывается один раз при импорте.
+    
+    Args:
+        text (str): Исходный текст
+        
+    Returns:
+        str: Текст без пробелов в конце строк и без лишних пустых строк
+    """
+    text = '\n'.join(line.rstrip() for line in text.splitlines())
+    return _EXTRA_NEWLINES_RE.sub('\n\n', text).strip()
+
+
+# Шаблон сообщения с текущей погодой (заполняется через str.format_map)
+_WEATHER_TEMPLATE = (
+    "{emoji} <b>{city}, {country}</b>\n"
+    "\n"
+    "🌡️ <b>Температура:</b> {temperature}°C\n"
+    "🤚 <b>Ощущается как:</b> {feels_like}°C\n"
+    "📝 <b>Описание:</b> {description}\n"
+    "\n"
+    "💨 <b>Ветер:</b> {wind_speed} м/с {wind_dir}\n"
+    "💧 <b>Влажность:</b> {humidity}%\n"
+    "📊 <b>Давление:</b> {pressure} гПа\n"
+    "☁️ <b>Облачность:</b> {cloudiness}%\n"
+    "👁️ <b>Видимость:</b> {visibility} км\n"
+    "\n"
+    "🌅 <b>Восход:</b> {sunrise_str}\n"
+    "🌇 <b>Закат:</b> {sunset_str}\n"
+    "\n"
+    "<i>Обновлено: {updated}</i>"
+)
+
+# Значения полей шаблона, отсутствующих в данных о погоде
+_WEATHER_DEFAULTS = {
+    'city': 'Неизвестно',
+    'country': '',
+    'temperature': 0,
+    'feels_like': 0,
+    'description': 'Неизвестно',
+    'wind_speed': 0,
+    'humidity': 0,
+    'pressure': 0,
+    'cloudiness': 0,
+    'visibility': 0,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _format_minute(minute: int) -> str:
+    """Строка даты и времени для минуты с начала эпохи"""
+    return datetime.fromtimestamp(minute * 60).strftime('%d.%m.%Y %H:%M')
+
+
+def _updated_at() -> str:
+    """
+    Текущее время для подписи "Обновлено"
+    
+    Строка форматируется не чаще раза в минуту (точность подписи - минута).
+    
+    Returns:
+        str: Время в формате ДД.ММ.ГГГГ ЧЧ:ММ
+    """
+    return _format_minute(int(time.time() // 60))
+
+
+# Эмодзи по коду иконки OpenWeatherMap
+_EMOJI_MAP = {
+    '01d': '☀️',    # clear sky day
+    '01n': '🌙',    # clear sky night
+    '02d': '⛅',   # few clouds day
+    '02n': '☁️',    # few clouds night
+    '03d': '☁️',    # scattered clouds
+    '03n': '☁️',    # scattered clouds
+    '04d': '☁️',    # broken clouds
+    '04n': '☁️',    # broken clouds
+    '09d': '🌧️',    # shower rain
+    '09n': '🌧️',    # shower rain
+    '10d': '🌦️',    # rain day
+    '10n': '🌧️',    # rain night
+    '11d': '⛈️',    # thunderstorm
+    '11n': '⛈️',    # thunderstorm
+    '13d': '❄️',    # snow
+    '13n': '❄️',    # snow
+    '50d': '🌫️',    # mist
+    '50n': '🌫️',    # mist
+}
+
+# Румбы ветра по секторам 22.5°, начиная с севера
+_WIND_DIRS = (
+    "С", "ССВ", "СВ", "ВСВ",
+    "В", "ВЮВ", "ЮВ", "ЮЮВ",
+    "Ю", "ЮЮЗ", "ЮЗ", "ЗЮЗ",
+    "З", "ЗСЗ", "СЗ", "ССЗ"
+)
+_WIND_SECTORS_PER_DEGREE = 16 / 360
+
+# Сокращенные названия дней недели (индекс - datetime.weekday())
+_DAY_NAMES = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+
 
 def format_weather_message(weather_data: Dict) -> str:
     """
@@ -24,36 +133,19 @@ def format_weather_message(weather_data: Dict) -> str:
     if not weather_data:
         return "❌ Данные о погоде недоступны"
     
-    # Получаем эмодзи для погоды
-    weather_emoji = get_weather_emoji(weather_data.get('icon', ''))
-    
-    # Определяем направление ветра
-    wind_direction = get_wind_direction(weather_data.get('wind_direction', 0))
-    
     # Форматируем время восхода и заката
-    sunrise = weather_data.get('sunrise', datetime.now()).strftime('%H:%M')
-    sunset = weather_data.get('sunset', datetime.now()).strftime('%H:%M')
-    
-    message = f"""
-{weather_emoji} <b>{weather_data.get('city', 'Неизвестно')}, {weather_data.get('country', '')}</b>
-
-🌡️ <b>Температура:</b> {weather_data.get('temperature', 0)}°C
-🤚 <b>Ощущается как:</b> {weather_data.get('feels_like', 0)}°C
-📝 <b>Описание:</b> {weather_data.get('description', 'Неизвестно')}
-
-💨 <b>Ветер:</b> {weather_data.get('wind_speed', 0)} м/с {wind_direction}
-💧 <b>Влажность:</b> {weather_data.get('humidity', 0)}%
-📊 <b>Давление:</b> {weather_data.get('pressure', 0)} гПа
-☁️ <b>Облачность:</b> {weather_data.get('cloudiness', 0)}%
-👁️ <b>Видимость:</b> {weather_data.get('visibility', 0)} км
-
-🌅 <b>Восход:</b> {sunrise}
-🌇 <b>Закат:</b> {sunset}
-
-<i>Обновлено: {datetime.now().strftime('%d.%m.%Y %H:%M')}</i>
-"""
-    
-    return message.strip()
+    sunrise = weather_data.get('sunrise') or datetime.now()
+    sunset = weather_data.get('sunset') or datetime.now()
+    
+    return _WEATHER_TEMPLATE.format_map({
+        **_WEATHER_DEFAULTS,
+        **weather_data,
+        'emoji': get_weather_emoji(weather_data.get('icon', '')),
+        'wind_dir': get_wind_direction(weather_data.get('wind_direction', 0)),
+        'sunrise_str': sunrise.strftime('%H:%M'),
+        'sunset_str': sunset.strftime('%H:%M'),
+        'updated': _updated_at(),
+    })
 
 
 def format_forecast_message(forecast_data: Dict) -> str:
@@ -73,8 +165,7 @@ def format_forecast_message(forecast_data: Dict) -> str:
     country = forecast_data.get('country', '')
     forecasts = forecast_data.get('forecasts', [])
     
-    message = f"📅 <b>Прогноз погоды на 5 дней</b>\n"
-    message += f"📍 <b>{city}, {country}</b>\n\n"
+    parts = [f"📅 <b>Прогноз погоды на 5 дней</b>\n📍 <b>{city}, {country}</b>\n\n"]
     
     for i, forecast in enumerate(forecasts):
         date_obj = forecast.get('date', datetime.now())
@@ -85,8 +176,7 @@ def format_forecast_message(forecast_data: Dict) -> str:
         elif i == 1:
             day_name = "Завтра"
         else:
-            day_names = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
-            day_name = day_names[date_obj.weekday()]
+            day_name = _DAY_NAMES[date_obj.weekday()]
         
         # Получаем эмодзи
         weather_emoji = get_weather_emoji(forecast.get('icon', ''))
@@ -94,14 +184,16 @@ def format_forecast_message(forecast_data: Dict) -> str:
         # Форматируем дату
         date_str = date_obj.strftime('%d.%m')
         
-        message += f"{weather_emoji} <b>{day_name}, {date_str}</b>\n"
-        message += f"🌡️ {forecast.get('temp_min', 0)}°...{forecast.get('temp_max', 0)}°C\n"
-        message += f"📝 {forecast.get('description', 'Неизвестно')}\n"
-        message += f"💧 {forecast.get('avg_humidity', 0)}% | 💨 {forecast.get('avg_wind_speed', 0)} м/с\n\n"
+        parts.append(
+            f"{weather_emoji} <b>{day_name}, {date_str}</b>\n"
+            f"🌡️ {forecast.get('temp_min', 0)}°...{forecast.get('temp_max', 0)}°C\n"
+            f"📝 {forecast.get('description', 'Неизвестно')}\n"
+            f"💧 {forecast.get('avg_humidity', 0)}% | 💨 {forecast.get('avg_wind_speed', 0)} м/с\n\n"
+        )
     
-    message += f"<i>Прогноз обновлен: {datetime.now().strftime('%d.%m.%Y %H:%M')}</i>"
+    parts.append(f"<i>Прогноз обновлен: {_updated_at()}</i>")
     
-    return message.strip()
+    return ''.join(parts).strip()
 
 
 def get_weather_emoji(icon_code: str) -> str:
@@ -114,28 +206,7 @@ def get_weather_emoji(icon_code: str) -> str:
     Returns:
         str: Соответствующий эмодзи
     """
-    emoji_map = {
-        '01d': '☀️',    # clear sky day
-        '01n': '🌙',    # clear sky night
-        '02d': '⛅',   # few clouds day
-        '02n': '☁️',    # few clouds night
-        '03d': '☁️',    # scattered clouds
-        '03n': '☁️',    # scattered clouds
-        '04d': '☁️',    # broken clouds
-        '04n': '☁️',    # broken clouds
-        '09d': '🌧️',    # shower rain
-        '09n': '🌧️',    # shower rain
-        '10d': '🌦️',    # rain day
-        '10n': '🌧️',    # rain night
-        '11d': '⛈️',    # thunderstorm
-        '11n': '⛈️',    # thunderstorm
-        '13d': '❄️',    # snow
-        '13n': '❄️',    # snow
-        '50d': '🌫️',    # mist
-        '50n': '🌫️',    # mist
-    }
-    
-    return emoji_map.get(icon_code, '🌤️')
+    return _EMOJI_MAP.get(icon_code, '🌤️')
 
 
 def get_wind_direction(degrees: float) -> str:
@@ -143,25 +214,13 @@ def get_wind_direction(degrees: float) -> str:
     Получение направления ветра по градусам
     
     Args:
-        degrees (float): Градусы направления ветра
+        degrees (float): Градусы направления ветра (0-360, как в API)
         
     Returns:
         str: Направление ветра
     """
-    directions = [
-        "С", "ССВ", "СВ", "ВСВ",
-        "В", "ВЮВ", "ЮВ", "ЮЮВ",
-        "Ю", "ЮЮЗ", "ЮЗ", "ЗЮЗ",
-        "З", "ЗСЗ", "СЗ", "ССЗ"
-    ]
-    
-    # Нормализуем градусы к диапазону 0-360
-    degrees = degrees % 360
-    
-    # Определяем индекс направления
-    index = round(degrees / 22.5) % 16
-    
-    return directions[index]
+    # Номер сектора 22.5°: округление через +0.5, "& 15" заменяет % 360
+    return _WIND_DIRS[int(degrees * _WIND_SECTORS_PER_DEGREE + 0.5) & 15]
 
 
 def format_temperature(temp: float, units: str = "metric") -> str:
@@ -183,6 +242,12 @@ def format_temperature(temp: float, units: str = "metric") -> str:
         return f"{round(temp)}K"
 
 
+# Ключевые слова осадков в описании погоды (без учета регистра)
+_RAIN_RE = re.compile(r'дождь|rain|shower', re.IGNORECASE)
+_SNOW_RE = re.compile(r'снег|snow', re.IGNORECASE)
+_MIST_RE = re.compile(r'туман|mist', re.IGNORECASE)
+
+
 def get_weather_advice(weather_data: Dict) -> str:
     """
     Получение советов по погоде
@@ -194,7 +259,7 @@ def get_weather_advice(weather_data: Dict) -> str:
         str: Совет по погоде
     """
     temp = weather_data.get('temperature', 0)
-    description = weather_data.get('description', '').lower()
+    description = weather_data.get('description', '')
     wind_speed = weather_data.get('wind_speed', 0)
     humidity = weather_data.get('humidity', 0)
     
@@ -213,11 +278,11 @@ def get_weather_advice(weather_data: Dict) -> str:
         advice.append("🌡️ Очень жарко! Пейте больше воды")
     
     # Советы по осадкам
-    if any(word in description for word in ['дождь', 'rain', 'shower']):
+    if _RAIN_RE.search(description):
         advice.append("☂️ Возьмите зонт!")
-    elif 'снег' in description or 'snow' in description:
+    elif _SNOW_RE.search(description):
         advice.append("❄️ Снег! Обувь с хорошим протектором")
-    elif 'туман' in description or 'mist' in description:
+    elif _MIST_RE.search(description):
         advice.append("🌫️ Туман, будьте осторожны на дороге")
     
     # Советы по ветру
@@ -242,11 +307,11 @@ def format_time_with_timezone(timestamp: datetime, timezone_offset: int) -> str:
     Returns:
         str: Отформатированное время
     """
-    # Создаем объект часового пояса
-    tz = pytz.FixedOffset(timezone_offset // 60)
+    # Фиксированное смещение от UTC (stdlib, без pytz)
+    tz = timezone(timedelta(seconds=timezone_offset))
     
     # Применяем часовой пояс
-    local_time = timestamp.replace(tzinfo=pytz.UTC).astimezone(tz)
+    local_time = timestamp.replace(tzinfo=timezone.utc).astimezone(tz)
     
     return local_time.strftime('%H:%M')
 
@@ -293,15 +358,17 @@ def format_detailed_forecast(forecast_data: Dict) -> List[str]:
         date_obj = forecast.get('date', datetime.now())
         weather_emoji = get_weather_emoji(forecast.get('icon', ''))
         
+        avg_temp = (forecast.get('temp_min', 0) + forecast.get('temp_max', 0)) / 2
+        
         # Уровень комфорта
         comfort_level, comfort_desc = get_comfort_level(
-            (forecast.get('temp_min', 0) + forecast.get('temp_max', 0)) / 2,
+            avg_temp,
             forecast.get('avg_humidity', 0)
         )
         
         # Совет по погоде
         advice = get_weather_advice({
-            'temperature': (forecast.get('temp_min', 0) + forecast.get('temp_max', 0)) / 2,
+            'temperature': avg_temp,
             'description': forecast.get('description', ''),
             'wind_speed': forecast.get('avg_wind_speed', 0),
             'humidity': forecast.get('avg_humidity', 0)
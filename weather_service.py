@@ -6,11 +6,20 @@
 
 import asyncio
 import logging
-from typing import Optional, Dict, List
-from datetime import datetime
+import random
+from collections import Counter
+from typing import Callable, Optional, Dict, List, Tuple
+from datetime import datetime, timezone
 import aiohttp
 
+try:
+    from orjson import loads as json_loads
+except ImportError:  # orjson необязателен, без него используется json
+    from json import loads as json_loads
+
+from cache import SingleFlight, TTLCache
 from config import get_config
+from utils import get_weather_emoji
 
 
 logger = logging.getLogger(__name__)
@@ -22,18 +31,40 @@ class WeatherService:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.config = get_config()
+        # Значения, нужные на каждый запрос, храним прямо в объекте
+        self._max_retries = self.config.max_retries
+        self._current_url = self.config.current_weather_url
+        self._forecast_url = self.config.forecast_url
+        self._get_params = self.config.get_weather_params
         self.session: Optional[aiohttp.ClientSession] = None
+        # Кэш ответов по городу: повторные запросы не ходят в API до истечения TTL
+        self._current_cache = TTLCache(self.config.cache_maxsize, self.config.weather_cache_ttl)
+        self._forecast_cache = TTLCache(self.config.cache_maxsize, self.config.forecast_cache_ttl)
+        # Одновременные запросы одного города ждут общий ответ API
+        self._single_flight = SingleFlight()
+    
+    async def start(self):
+        """Открытие HTTP сессии заранее, до первого запроса"""
+        await self._get_session()
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        """Получение HTTP сессии"""
+        """Получение долгоживущей HTTP сессии с пулом keep-alive соединений"""
         if self.session is None or self.session.closed:
             timeout = aiohttp.ClientTimeout(total=self.config.request_timeout)
-            self.session = aiohttp.ClientSession(timeout=timeout)
+            connector = aiohttp.TCPConnector(
+                limit=self.config.connection_limit,
+                limit_per_host=self.config.connection_limit_per_host,
+                ttl_dns_cache=self.config.dns_cache_ttl,
+                keepalive_timeout=self.config.keepalive_timeout,
+                # Закрываем "зависшие" после SSL shutdown соединения
+                enable_cleanup_closed=True
+            )
+            self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
         return self.session
     
     async def _make_request(self, url: str, params: dict) -> Optional[dict]:
         """
-        Выполнение HTTP запроса к API
+        Выполнение HTTP запроса к API с повторными попытками
         
         Args:
             url (str): URL для запроса
@@ -44,27 +75,36 @@ class WeatherService:
         """
         session = await self._get_session()
         
-        for attempt in range(self.config.max_retries):
+        for attempt in range(self._max_retries):
             try:
                 async with session.get(url, params=params) as response:
                     if response.status == 200:
-                        data = await response.json()
+                        # content_type=None: не проверяем заголовок Content-Type
+                        data = await response.json(content_type=None, loads=json_loads)
                         return data
                     elif response.status == 404:
-                        logger.warning(f"Город не найден: {params.get('q')}")
+                        logger.warning("Город не найден: %s", params.get('q'))
                         return None
                     else:
-                        logger.error(f"API ошибка {response.status}: {await response.text()}")
+                        logger.error("API ошибка %s", response.status)
+                        # Тело ответа читаем только при отладке
+                        if logger.isEnabledFor(logging.DEBUG):
+                            logger.debug("Ответ API: %s", await response.text())
+                        if response.status in (400, 401):
+                            # Неверный запрос или ключ API - повтор не поможет
+                            return None
                         
             except asyncio.TimeoutError:
-                logger.error(f"Таймаут запроса (попытка {attempt + 1})")
+                logger.error("Таймаут запроса (попытка %s)", attempt + 1)
             except aiohttp.ClientError as e:
-                logger.error(f"Ошибка клиента (попытка {attempt + 1}): {e}")
+                logger.error("Ошибка клиента (попытка %s): %s", attempt + 1, e)
             except Exception as e:
-                logger.error(f"Неожиданная ошибка (попытка {attempt + 1}): {e}")
+                logger.error("Неожиданная ошибка (попытка %s): %s", attempt + 1, e)
             
-            if attempt < self.config.max_retries - 1:
-                await asyncio.sleep(1)  # Пауза между попытками
+            if attempt < self._max_retries - 1:
+                # Экспоненциальная пауза (1, 2, 4... с) со случайной добавкой,
+                # чтобы повторы разных запросов не шли к API одновременно
+                await asyncio.sleep(min(2 ** attempt, 8) + random.random() * 0.3)
         
         return None
     
@@ -78,12 +118,9 @@ class WeatherService:
         Returns:
             Optional[Dict]: Данные о погоде или None
         """
-        params = self.config.get_weather_params(city, forecast=False)
-        data = await self._make_request(self.config.current_weather_url, params)
-        
-        if data:
-            return self._format_current_weather(data)
-        return None
+        return await self._get_cached(
+            self._current_cache, self._current_url, self._format_current_weather, city, forecast=False
+        )
     
     async def get_forecast(self, city: str) -> Optional[Dict]:
         """
@@ -95,12 +132,63 @@ class WeatherService:
         Returns:
             Optional[Dict]: Прогноз погоды или None
         """
-        params = self.config.get_weather_params(city, forecast=True)
-        data = await self._make_request(self.config.forecast_url, params)
+        return await self._get_cached(
+            self._forecast_cache, self._forecast_url, self._format_forecast_data, city, forecast=True
+        )
+    
+    async def _get_cached(
+        self,
+        cache: TTLCache,
+        url: str,
+        formatter: Callable[[dict], Dict],
+        city: str,
+        forecast: bool
+    ) -> Optional[Dict]:
+        """
+        Получение данных через кэш с объединением одновременных запросов
         
-        if data:
-            return self._format_forecast_data(data)
-        return None
+        Args:
+            cache (TTLCache): Кэш для данного типа запроса
+            url (str): URL API
+            formatter (Callable[[dict], Dict]): Разбор ответа API
+            city (str): Название города
+            forecast (bool): Прогноз или текущая погода
+            
+        Returns:
+            Optional[Dict]: Данные или None
+        """
+        key = city.strip().casefold()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        
+        async def load() -> Optional[Dict]:
+            data = await self._make_request(url, self._get_params(city, forecast=forecast))
+            if not data:
+                return None
+            result = formatter(data)
+            if result:
+                cache.set(key, result)
+            return result
+        
+        return await self._single_flight.run((url, key), load)
+    
+    async def get_weather_report(self, city: str) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """
+        Одновременное получение текущей погоды и прогноза
+        
+        Args:
+            city (str): Название города
+            
+        Returns:
+            Tuple[Optional[Dict], Optional[Dict]]: (текущая погода, прогноз)
+        """
+        # gather вместо TaskGroup - бот поддерживает Python 3.9+
+        current, forecast = await asyncio.gather(
+            self.get_current_weather(city),
+            self.get_forecast(city)
+        )
+        return current, forecast
     
     def _format_current_weather(self, data: dict) -> Dict:
         """Форматирование данных текущей погоды"""
@@ -128,7 +216,7 @@ class WeatherService:
                 'timezone': data['timezone']
             }
         except KeyError as e:
-            logger.error(f"Ошибка форматирования данных погоды: {e}")
+            logger.error("Ошибка форматирования данных погоды: %s", e)
             return {}
     
     def _format_forecast_data(self, data: dict) -> Dict:
@@ -137,21 +225,27 @@ class WeatherService:
             city_info = data['city']
             forecast_list = data['list']
             
-            # Группируем прогноз по дням
+            # Группируем прогноз по дням: номер суток по местному времени города
+            tz_offset = city_info.get('timezone', 0)
             daily_forecasts = {}
+            max_days = 5
             
             for item in forecast_list:
-                date_obj = datetime.fromtimestamp(item['dt'])
-                date_key = date_obj.strftime('%Y-%m-%d')
+                date_key = (item['dt'] + tz_offset) // 86400
                 
                 if date_key not in daily_forecasts:
+                    # Элементы идут по времени: начался 6-й день - дальше не нужно
+                    if len(daily_forecasts) >= max_days:
+                        break
                     daily_forecasts[date_key] = {
-                        'date': date_obj,
+                        'first_dt': item['dt'],
                         'temp_min': item['main']['temp'],
                         'temp_max': item['main']['temp'],
                         'descriptions': [],
-                        'humidity': [],
-                        'wind_speeds': [],
+                        # Накопители для средних значений за день
+                        'humidity_sum': 0,
+                        'wind_sum': 0.0,
+                        'samples': 0,
                         'main_weather': item['weather'][0]['main'],
                         'icon': item['weather'][0]['icon']
                     }
@@ -160,31 +254,33 @@ class WeatherService:
                 forecast['temp_min'] = min(forecast['temp_min'], item['main']['temp'])
                 forecast['temp_max'] = max(forecast['temp_max'], item['main']['temp'])
                 forecast['descriptions'].append(item['weather'][0]['description'])
-                forecast['humidity'].append(item['main']['humidity'])
-                forecast['wind_speeds'].append(item['wind']['speed'])
+                forecast['humidity_sum'] += item['main']['humidity']
+                forecast['wind_sum'] += item['wind']['speed']
+                forecast['samples'] += 1
             
             # Усредняем данные по дням
-            for date_key in daily_forecasts:
-                forecast = daily_forecasts[date_key]
+            for forecast in daily_forecasts.values():
+                # datetime создаем только для первой точки дня (местное время города)
+                forecast['date'] = datetime.fromtimestamp(
+                    forecast.pop('first_dt') + tz_offset, timezone.utc
+                ).replace(tzinfo=None)
                 forecast['temp_min'] = round(forecast['temp_min'])
                 forecast['temp_max'] = round(forecast['temp_max'])
-                forecast['avg_humidity'] = round(sum(forecast['humidity']) / len(forecast['humidity']))
-                forecast['avg_wind_speed'] = round(sum(forecast['wind_speeds']) / len(forecast['wind_speeds']), 1)
+                samples = forecast['samples']
+                forecast['avg_humidity'] = round(forecast['humidity_sum'] / samples)
+                forecast['avg_wind_speed'] = round(forecast['wind_sum'] / samples, 1)
                 
                 # Берем самое частое описание
-                description_counts = {}
-                for desc in forecast['descriptions']:
-                    description_counts[desc] = description_counts.get(desc, 0) + 1
-                forecast['description'] = max(description_counts.items(), key=lambda x: x[1])[0].title()
+                forecast['description'] = Counter(forecast['descriptions']).most_common(1)[0][0].title()
             
             return {
                 'city': city_info['name'],
                 'country': city_info['country'],
-                'forecasts': list(daily_forecasts.values())[:5]  # Берем только 5 дней
+                'forecasts': list(daily_forecasts.values())
             }
             
         except KeyError as e:
-            logger.error(f"Ошибка форматирования прогноза: {e}")
+            logger.error("Ошибка форматирования прогноза: %s", e)
             return {}
     
     async def close(self):
@@ -202,25 +298,4 @@ class WeatherService:
         Returns:
             str: Соответствующий эмодзи
         """
-        emoji_map = {
-            '01d': '☀️',    # clear sky day
-            '01n': '🌙',    # clear sky night
-            '02d': '⛅',   # few clouds day
-            '02n': '☁️',    # few clouds night
-            '03d': '☁️',    # scattered clouds
-            '03n': '☁️',    # scattered clouds
-            '04d': '☁️',    # broken clouds
-            '04n': '☁️',    # broken clouds
-            '09d': '🌧️',    # shower rain
-            '09n': '🌧️',    # shower rain
-            '10d': '🌦️',    # rain day
-            '10n': '🌧️',    # rain night
-            '11d': '⛈️',    # thunderstorm
-            '11n': '⛈️',    # thunderstorm
-            '13d': '❄️',    # snow
-            '13n': '❄️',    # snow
-            '50d': '🌫️',    # mist
-            '50n': '🌫️',    # mist
-        }
-        
-        return emoji_map.get(icon_code, '🌤️')
+        return get_weather_emoji(icon_code)